@@ -0,0 +1,66 @@
+# This benchmarks the block memory commands of the MikeOS Basic Emulator.
+# It compares PEEK/POKE loops with MEMCOPY and MEMFILL.
+#
+# Run from the repository root:
+#     python benchmarks/bench_block_memory.py
+
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join('src', 'mikeos_basic_emulator'))
+
+from constants import DEFAULT_LOAD_POINT
+from environment import Environment
+from runcmd import CommandRunner, EndOfProgramError
+
+BLOCK_SIZE = 4096
+
+LOOP_COPY = f'''\
+FOR I = 0 TO {BLOCK_SIZE - 1}
+PEEK V 40000 + I
+POKE V 50000 + I
+NEXT I
+'''
+
+LOOP_FILL = f'''\
+FOR I = 0 TO {BLOCK_SIZE - 1}
+POKE 32 50000 + I
+NEXT I
+'''
+
+BLOCK_COPY = f'''\
+MEMCOPY 40000 50000 {BLOCK_SIZE}
+'''
+
+BLOCK_FILL = f'''\
+MEMFILL 32 50000 {BLOCK_SIZE}
+'''
+
+def run_program(program: str) -> float:
+    env = Environment()
+    runner = CommandRunner(env)
+    env.memory.write_string(DEFAULT_LOAD_POINT, program, limit=len(program))
+    env.next_line_address = DEFAULT_LOAD_POINT
+    started = time.perf_counter()
+    while True:
+        try:
+            line = runner.read_program_line()
+        except EndOfProgramError:
+            break
+        runner.run_command(line)
+    return time.perf_counter() - started
+
+def compare(name: str, loop: str, block: str) -> None:
+    loop_time = run_program(loop)
+    block_time = run_program(block)
+    print(f'{name} {BLOCK_SIZE} bytes:')
+    print(f'  PEEK/POKE loop: {loop_time * 1000:.1f} ms')
+    print(f'  block command:  {block_time * 1000:.3f} ms '
+        f'({loop_time / block_time:.0f}x faster)')
+
+if __name__ == '__main__':
+    compare('Copy', LOOP_COPY, BLOCK_COPY)
+    compare('Fill', LOOP_FILL, BLOCK_FILL)
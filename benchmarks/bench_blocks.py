@@ -0,0 +1,63 @@
+# This benchmarks running programs in basic blocks in the MikeOS Basic Emulator.
+# It compares checking the queue after every line with after a few blocks.
+#
+# Run from the repository root:
+#     python benchmarks/bench_blocks.py
+
+import os
+import queue
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join('src', 'mikeos_basic_emulator'))
+
+from environment import Environment
+from runcmd import CommandQueue, CommandRunnerThread
+
+ROUNDS = 5000
+
+# Straight-line updates in a loop, with a subroutine call.
+PROGRAM = f'''\
+N = 0
+mainloop:
+X = X + 3
+Y = Y + X
+IF Y > 1000 THEN Y = Y - 1000
+Z = X * 2 + Y
+GOSUB tally
+N = N + 1
+IF N < {ROUNDS} THEN GOTO mainloop
+END
+tally:
+T = T + Z
+T = T % 10000
+RETURN
+'''
+
+def run_program(blocks: bool) -> float:
+    env = Environment()
+    thread = CommandRunnerThread(env, CommandQueue())
+    env.load_program(PROGRAM)
+    thread.running_from_memory = True
+    started = time.perf_counter()
+    # The same loop as CommandRunnerThread.run(), without the display.
+    while thread.running_from_memory and not env.program_finished:
+        try:
+            thread.run_from_queue()
+        except queue.Empty:
+            if blocks:
+                thread.run_from_memory()
+            else:
+                thread.run_line_from_memory()
+        time.sleep(0)
+    return time.perf_counter() - started
+
+if __name__ == '__main__':
+    lines = run_program(blocks=False)
+    blocks = run_program(blocks=True)
+    print(f'{ROUNDS} rounds of a 12 line loop:')
+    print(f'  line by line: {lines * 1000:.1f} ms')
+    print(f'  blocks:       {blocks * 1000:.1f} ms '
+        f'({lines / blocks:.1f}x faster)')
@@ -0,0 +1,56 @@
+# This benchmarks the debugger hooks of the MikeOS Basic Emulator.
+# It runs the same program with debugging turned on and off.
+#
+# Before the hooks, every command, assignment and PRINT paid for the
+# debugger as if it was turned on.
+#
+# Run from the repository root:
+#     python benchmarks/bench_debug_hooks.py
+
+import logging
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join('src', 'mikeos_basic_emulator'))
+
+from constants import DEFAULT_LOAD_POINT
+from environment import Environment
+from runcmd import CommandRunner, EndOfProgramError
+
+PROGRAM = '''\
+FOR I = 1 TO 3000
+A = A + I
+B = A % 7
+C = B * 2
+NEXT I
+'''
+
+def run_program(debugging: bool) -> tuple[int, float]:
+    env = Environment()
+    runner = CommandRunner(env)
+    if debugging:
+        env.debugger.enable()
+    env.memory.write_string(DEFAULT_LOAD_POINT, PROGRAM, limit=len(PROGRAM))
+    env.next_line_address = DEFAULT_LOAD_POINT
+    lines = 0
+    started = time.perf_counter()
+    while True:
+        try:
+            line = runner.read_program_line()
+        except EndOfProgramError:
+            break
+        runner.run_command(line)
+        lines += 1
+    return lines, time.perf_counter() - started
+
+if __name__ == '__main__':
+    # Debug messages are discarded, as in a normal run.
+    logging.basicConfig(level=logging.INFO)
+    for debugging in (True, False):
+        lines, elapsed = run_program(debugging)
+        state = 'on' if debugging else 'off'
+        print(f'Debugging {state}: {lines} lines in {elapsed:.3f} s '
+            f'({lines / elapsed:.0f} lines/s)')
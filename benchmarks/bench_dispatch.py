@@ -0,0 +1,57 @@
+# This benchmarks IF ... THEN GOTO chains in the MikeOS Basic Emulator.
+# It compares testing each line in turn with the compiled dispatch.
+#
+# Run from the repository root:
+#     python benchmarks/bench_dispatch.py
+
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join('src', 'mikeos_basic_emulator'))
+
+from environment import Environment
+from runcmd import CommandRunner, EndOfProgramError
+
+STATES = 10
+ROUNDS = 2000
+
+# A state machine that goes through each state in turn.
+PROGRAM = f'''\
+S = 0
+N = 0
+mainloop:
+{''.join(f'IF S = {n} THEN GOTO state{chr(97 + n)}{chr(10)}' for n in range(STATES))}\
+GOTO finish
+{''.join(f'state{chr(97 + n)}:{chr(10)}GOTO advance{chr(10)}' for n in range(STATES))}\
+advance:
+S = S + 1
+S = S % {STATES}
+N = N + 1
+IF N < {ROUNDS * STATES} THEN GOTO mainloop
+finish:
+'''
+
+def run_program(dispatch: bool) -> float:
+    env = Environment()
+    runner = CommandRunner(env)
+    env.set_command_runner(runner)
+    env.load_program(PROGRAM)
+    if not dispatch:
+        env.get_program().dispatch_chains.clear()
+    started = time.perf_counter()
+    while True:
+        try:
+            runner.step()
+        except EndOfProgramError:
+            break
+    return time.perf_counter() - started
+
+if __name__ == '__main__':
+    lines = run_program(dispatch=False)
+    chain = run_program(dispatch=True)
+    print(f'{ROUNDS * STATES} dispatches over {STATES} states:')
+    print(f'  line by line: {lines * 1000:.1f} ms')
+    print(f'  dispatch:     {chain * 1000:.1f} ms ({lines / chain:.1f}x faster)')
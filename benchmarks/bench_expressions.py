@@ -0,0 +1,57 @@
+# This benchmarks compiled sums in the MikeOS Basic Emulator.
+# It compares spilling a sum into extra lines with one bracketed sum.
+#
+# Run from the repository root:
+#     python benchmarks/bench_expressions.py
+
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join('src', 'mikeos_basic_emulator'))
+
+from environment import Environment
+from expression import ExpressionCompiler
+from runcmd import CommandRunner, EndOfProgramError
+
+# Works out (I + 3) * (I + 5) - I / 2 the way MikeOS programs have to.
+SPILLED = '''\
+FOR I = 1 TO 5000
+A = I + 3
+B = I + 5
+C = I / 2
+A = A * B
+A = A - C
+NEXT I
+'''
+
+BRACKETED = '''\
+FOR I = 1 TO 5000
+A = (I + 3) * (I + 5) - I / 2
+NEXT I
+'''
+
+def run_program(program: str) -> tuple[float, int]:
+    env = Environment()
+    runner = CommandRunner(env)
+    env.set_command_runner(runner)
+    env.load_program(program)
+    started = time.perf_counter()
+    while True:
+        try:
+            runner.step()
+        except EndOfProgramError:
+            break
+    return time.perf_counter() - started, env.variables.get_numeric_variable('A')
+
+if __name__ == '__main__':
+    # Brackets need operator precedence, which MikeOS doesn't have.
+    ExpressionCompiler.precedence = True
+    spilled_time, spilled_result = run_program(SPILLED)
+    bracketed_time, bracketed_result = run_program(BRACKETED)
+    assert spilled_result == bracketed_result
+    print(f'Spilled into extra lines: {spilled_time * 1000:.1f} ms')
+    print(f'One bracketed sum:        {bracketed_time * 1000:.1f} ms '
+        f'({spilled_time / bracketed_time:.1f}x faster)')
@@ -0,0 +1,79 @@
+# This benchmarks string reads in the MikeOS Basic Emulator.
+# It compares copying reads with memoryview reads and times a string-heavy
+# BASIC program.
+#
+# Run from the repository root:
+#     python benchmarks/bench_strings.py
+
+import os
+import sys
+import time
+import timeit
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.join('src', 'mikeos_basic_emulator'))
+
+from constants import DEFAULT_LOAD_POINT
+from environment import Environment
+from memory import Memory
+from runcmd import CommandRunner, EndOfProgramError
+
+READS = 200_000
+
+PROGRAM = '''\
+$1 = "THE QUICK BROWN FOX"
+$2 = "JUMPS OVER THE LAZY DOG"
+FOR A = 1 TO 2000
+$3 = $1
+$3 = $3 + $2
+LEN $3 B
+CASE LOWER $3
+NEXT A
+'''
+
+def copying_read_string(memory: Memory,
+    address: int,
+    limit: int = 127,
+    terminator: int = 0) -> str:
+
+    """ The original `read_string`, which copies and scans twice. """
+    encoded = memory.data[address:address + limit]
+    if terminator in encoded:
+        length = encoded.index(terminator)
+    else:
+        length = limit
+    return encoded[:length].decode('cp437', 'replace')
+
+def bench_reads() -> None:
+    memory = Memory()
+    memory.write_string(0x8000, 'THE QUICK BROWN FOX JUMPS\0')
+    copying = timeit.timeit(
+        lambda: copying_read_string(memory, 0x8000), number=READS)
+    viewing = timeit.timeit(
+        lambda: memory.read_string(0x8000), number=READS)
+    print(f'{READS} string reads:')
+    print(f'  copying:    {copying:.3f} s')
+    print(f'  memoryview: {viewing:.3f} s')
+
+def bench_program() -> None:
+    env = Environment()
+    runner = CommandRunner(env)
+    env.memory.write_string(DEFAULT_LOAD_POINT, PROGRAM, limit=len(PROGRAM))
+    env.next_line_address = DEFAULT_LOAD_POINT
+    lines = 0
+    started = time.perf_counter()
+    while True:
+        try:
+            line = runner.read_program_line()
+        except EndOfProgramError:
+            break
+        runner.run_command(line)
+        lines += 1
+    elapsed = time.perf_counter() - started
+    print(f'String program: {lines} lines in {elapsed:.3f} s '
+        f'({lines / elapsed:.0f} lines/s)')
+
+if __name__ == '__main__':
+    bench_reads()
+    bench_program()
@@ -1,10 +1,27 @@
 from typing import Callable
 
 from argument import ArgumentError, CommandArgument
+from expression import Expression, ExpressionCompiler
 from parser import Token
 from variables import VariableManager
 from environment import Environment
 
+
+class ParsedCommand:
+    """
+    The parts of a command that are the same each time it's run.
+
+    These are its tokens, an argument for each token and the sums that
+    have been compiled so far (by the argument index they start at).
+    A command can be run again by making a new CommandArgumentList from
+    this, rather than parsing and compiling it all again.
+    """
+    def __init__(self, tokens: list[Token], vars: VariableManager) -> None:
+        self.tokens = tokens
+        self.args = [CommandArgument(token, vars) for token in tokens]
+        self.expressions: dict[int, tuple[Expression, int]] = {}
+
+
 class CommandArgumentList:
     """
     Represents a list of arguments in a command.
@@ -14,6 +31,8 @@ class CommandArgumentList:
     
     The class is built with a list of tokens and a variable manager instance.
     The variable manager is used to fetch and set variable values if needed.
+    A ParsedCommand of the same tokens can be given to share its arguments
+    and compiled sums, for a command that's run more than once.
 
     The values of the tokens may vary depending on which interpretation 
     method is called.
@@ -53,9 +72,16 @@ class CommandArgumentList:
     """
 
     
-    def __init__(self, tokens: list[Token], vars: VariableManager) -> None:
-        self.tokens = tokens
-        self.args = [CommandArgument(token, vars) for token in tokens]
+    def __init__(self,
+        tokens: list[Token],
+        vars: VariableManager,
+        parsed: ParsedCommand|None = None) -> None:
+
+        if parsed is None:
+            parsed = ParsedCommand(tokens, vars)
+        self.parsed = parsed
+        self.tokens = parsed.tokens
+        self.args = parsed.args
         self.index = 0
         self.variables = vars
 
@@ -473,25 +499,17 @@ class CommandArgumentList:
 
         This will consume all numeric values and operators in the arguments.
         The result will be returned.
-        """
 
-        result = self.get_numeric()
-        while self.has_symbol():
-            operator = self.get_symbol_from_list(['+', '-', '*', '/', '%'])
-            value = self.get_numeric()
-
-            if operator == '+':
-                result += value
-            elif operator == '-':
-                result -= value
-            elif operator == '*':
-                result *= value
-            elif operator == '/':
-                result //= value
-            elif operator == '%':
-                result %= value
+        The sum is compiled the first time (see expression.py) and the
+        compiled version is kept with the command, for the next time.
+        """
 
-        return result
+        compiled = self.parsed.expressions.get(self.index)
+        if compiled is None:
+            compiled = ExpressionCompiler(self.args).compile(self.index)
+            self.parsed.expressions[self.index] = compiled
+        expression, self.index = compiled
+        return expression()
     
     def do_string_building(self) -> str:
         """
@@ -509,15 +527,14 @@ class CommandArgumentList:
             result += value
 
         return result
-    
-    def make_new_arglist_from_remaining(self) -> 'CommandArgumentList':
-        """
-        Create a new argument list from the remaining arguments.
 
-        This is useful for conditional commands.
+    def get_remaining_text(self) -> str:
         """
-        
-        return CommandArgumentList(self.tokens[self.index:], self.variables)
+        Returns the remaining arguments as text, e.g. to log the part of an
+        IF after THEN.
+        """
+        return ' '.join(str(token.value) for token in self.tokens[self.index:])
+    
         
     
 
@@ -2,6 +2,7 @@
 # It is responsible for emulating a 80x25 VGA text mode display.
 # Roughly based on the mode 3 of the VGA standard.
 
+import threading
 import time
 from pathlib import Path
 
@@ -34,8 +35,31 @@ from variables import VariableManager
 
 VGA_FONT_PATH = Path('uni_vga/u_vga16.bdf')
 
+# Parsed fonts are kept for the life of the process.
+# The fork server loads them once so each worker starts with them ready.
+loaded_fonts: dict[int, Font] = {}
+
+def load_font(height: int) -> Font:
+    """ Returns the VGA font at the given height, loading it if needed. """
+    if height not in loaded_fonts:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        loaded_fonts[height] = pygame.font.Font(VGA_FONT_PATH, height)
+    return loaded_fonts[height]
+
 class PygameTextDisplay(GraphicTextDisplay):
+    """
+    Draws the text display with pygame.
+
+    The interpreter thread changes the cells and cursor while the main
+    thread draws them in `update()`. Both hold `lock` while they do, so the
+    cell state is never seen half changed. This is needed on free-threaded
+    builds where there is no GIL to serialise them by accident.
+
+    The lock is re-entrant as printing may scroll, which moves cells.
+    """
     def __init__(self, variables: VariableManager, debugger: Debugger) -> None:
+        self.lock = threading.RLock()
         self.set_defaults()
         self.initialise_display()
         self.setup_text_characters()
@@ -50,7 +74,7 @@ class PygameTextDisplay(GraphicTextDisplay):
     def initialise_display(self) -> None:
         pygame.init()
         self.screen: pygame.Surface|None = None
-        self.font = pygame.font.Font(VGA_FONT_PATH, self.character_height)
+        self.font = load_font(self.character_height)
         self.surface = pygame.Surface(
             (self.character_width * self.columns, self.character_height * self.lines)
         )
@@ -93,33 +117,37 @@ class PygameTextDisplay(GraphicTextDisplay):
     
     def update(self) -> None:
         is_updated = False
-        self.draw_cursor()
-        for character in self.characters:
-            character.draw()
-            is_updated |= character.updated
+        with self.lock:
+            self.draw_cursor()
+            for character in self.characters:
+                character.draw()
+                is_updated |= character.updated
             
         if self.screen and is_updated:
             self.screen.blit(self.surface, (0, 0))
             pygame.display.update()
         
     def move_cursor(self, position: Position) -> None:
-        self.set_cursor_state(False)
-        self.cursor.move(position)
+        with self.lock:
+            self.set_cursor_state(False)
+            self.cursor.move(position)
 
     def advance_cursor(self) -> None:
-        self.set_cursor_state(False)
-        self.cursor.advance()
+        with self.lock:
+            self.set_cursor_state(False)
+            self.cursor.advance()
         
     def scroll(self) -> None:
-        for y in range(1, self.lines):
+        with self.lock:
+            for y in range(1, self.lines):
+                for x in range(self.columns):
+                    self.get_cell(Position(x, y - 1)).copy_from(
+                        self.get_cell(Position(x, y))
+                    )
             for x in range(self.columns):
-                self.get_cell(Position(x, y - 1)).copy_from(
-                    self.get_cell(Position(x, y))
+                self.get_cell(Position(x, self.lines - 1)).set_char_and_colour(
+                    ' ', self.default_colour
                 )
-        for x in range(self.columns):
-            self.get_cell(Position(x, self.lines - 1)).set_char_and_colour(
-                ' ', self.default_colour
-            )
     
     def show_cursor(self) -> None:
         self.cursor_visible = True
@@ -128,13 +156,16 @@ class PygameTextDisplay(GraphicTextDisplay):
         self.cursor_visible = False
 
     def get_cursor_position(self) -> Position:
-        return self.cursor.get_position()
+        with self.lock:
+            return self.cursor.get_position()
     
     def get_character_at_cursor(self) -> str:
-        return self.get_cursor_cell().get_char()
+        with self.lock:
+            return self.get_cursor_cell().get_char()
     
     def get_character_colour_at_cursor(self) -> PalettePair:
-        return self.get_cursor_cell().get_colour()
+        with self.lock:
+            return self.get_cursor_cell().get_colour()
         
     def set_print_colour(self, colour: PalettePair) -> None:
         self.default_colour = colour
@@ -144,14 +175,15 @@ class PygameTextDisplay(GraphicTextDisplay):
         return self.default_colour
 
     def set_cursor_state(self, state: bool) -> None:
-        if state != self.cursor_state:
-            if state == True:
-                self.characters[self.cursor.get_offset()].show_cursor(
-                    self.cursor_height
-                )
-            else:
-                self.characters[self.cursor.get_offset()].hide_cursor()
-            self.cursor_state = state
+        with self.lock:
+            if state != self.cursor_state:
+                if state == True:
+                    self.characters[self.cursor.get_offset()].show_cursor(
+                        self.cursor_height
+                    )
+                else:
+                    self.characters[self.cursor.get_offset()].hide_cursor()
+                self.cursor_state = state
             
     def input_string(self, prompt: str = '') -> str:
         return self.keyboard.read_string(prompt)
@@ -179,27 +211,30 @@ class PygameTextDisplay(GraphicTextDisplay):
         return self.characters[position.row * self.columns + position.col]
 
     def newline(self) -> None:
-        self.set_cursor_state(False)
-        self.cursor.newline()
-        if self.cursor.wants_scroll():
-            self.scroll()
+        with self.lock:
+            self.set_cursor_state(False)
+            self.cursor.newline()
+            if self.cursor.wants_scroll():
+                self.scroll()
 
 
     def print(self, text: str, colour: PalettePair|None = None) -> None:
-        self.debugger.log_print(text)
+        self.debugger.print_hook(text)
         colour = colour or self.default_colour
-        for char in text:
-            if char == '\n':
-                self.newline()
-            else:
-                cell = self.characters[self.cursor.get_offset()]
-                cell.set_char_and_colour(char, colour)
-                self.advance_cursor()
+        with self.lock:
+            for char in text:
+                if char == '\n':
+                    self.newline()
+                else:
+                    cell = self.characters[self.cursor.get_offset()]
+                    cell.set_char_and_colour(char, colour)
+                    self.advance_cursor()
                 
     def clear_screen(self) -> None:
-        for cell in self.characters:
-            cell.set_char_and_colour(' ', self.default_colour)
-        self.move_cursor(Position(0, 0))
+        with self.lock:
+            for cell in self.characters:
+                cell.set_char_and_colour(' ', self.default_colour)
+            self.move_cursor(Position(0, 0))
         
     def has_exited(self) -> bool:
         return self.finished
@@ -229,9 +264,11 @@ class PygameTextDisplay(GraphicTextDisplay):
         char: str, 
         colour: PalettePair) -> None:
         
-        for y in range(area.start.row, area.end.row + 1):
-            for x in range(area.start.col, area.end.col + 1):
-                self.get_cell(Position(x, y)).set_char_and_colour(char, colour)
+        with self.lock:
+            for y in range(area.start.row, area.end.row + 1):
+                for x in range(area.start.col, area.end.col + 1):
+                    self.get_cell(Position(x, y)).set_char_and_colour(
+                        char, colour)
 
     def handle_events(self) -> None:
         for event in pygame.event.get():
@@ -243,6 +280,8 @@ class PygameTextDisplay(GraphicTextDisplay):
                 
     def exit(self) -> None:
         self.finished = True
+        # Fonts do not survive pygame.quit(), so they must be loaded again.
+        loaded_fonts.clear()
         pygame.quit()
             
 
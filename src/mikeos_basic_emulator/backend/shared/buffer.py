@@ -0,0 +1,122 @@
+# This is the shared text buffer for the out-of-process renderer.
+# It lays the screen out like VGA text memory in a shared memory block.
+
+from multiprocessing.shared_memory import SharedMemory
+import struct
+
+# Header fields, all little-endian.
+# - generation (uint32): odd while the interpreter is writing.
+# - cursor column (uint16)
+# - cursor row (uint16)
+# - interpreter flags (uint8)
+# - renderer flags (uint8)
+HEADER_FORMAT = '<IHHBB'
+HEADER_SIZE = 16
+GENERATION_FORMAT = '<I'
+INTERPRETER_FLAGS_OFFSET = 8
+RENDERER_FLAGS_OFFSET = 9
+
+# Interpreter flags.
+FLAG_CURSOR_VISIBLE = 0x01
+FLAG_INTERPRETER_EXITED = 0x02
+
+# Renderer flags.
+FLAG_RENDERER_EXITED = 0x01
+
+
+class SharedTextBuffer:
+    """
+    Screen cells shared between the interpreter and renderer processes.
+
+    Each cell is two bytes, as in VGA text mode:
+    - the cp437 character code
+    - the BIOS attribute (text colour | background colour << 4)
+
+    The interpreter is the only writer of cells and the cursor.
+    A generation counter makes it a sequence lock:
+    - `begin_write()` makes the generation odd.
+    - `end_write()` makes it even again.
+    Writes may be nested, only the outermost pair changes the generation.
+    The renderer copies the cells and only keeps the copy if the generation
+    was even and unchanged across the copy, so it never draws a torn frame.
+
+    Each side has its own flags byte so neither overwrites the other's.
+    """
+    def __init__(self, columns: int, lines: int,
+        name: str|None = None) -> None:
+
+        self.columns = columns
+        self.lines = lines
+        self.cell_bytes = columns * lines * 2
+        self.owner = name is None
+        self.write_depth = 0
+        if name is None:
+            self.memory = SharedMemory(
+                create=True, size=HEADER_SIZE + self.cell_bytes)
+        else:
+            self.memory = SharedMemory(name=name)
+        self.header = self.memory.buf[:HEADER_SIZE]
+        self.cells = self.memory.buf[HEADER_SIZE:HEADER_SIZE + self.cell_bytes]
+
+    def get_name(self) -> str:
+        return self.memory.name
+
+    def get_generation(self) -> int:
+        return struct.unpack_from(GENERATION_FORMAT, self.header, 0)[0]
+
+    def begin_write(self) -> None:
+        self.write_depth += 1
+        if self.write_depth == 1:
+            self.bump_generation()
+
+    def end_write(self) -> None:
+        self.write_depth -= 1
+        if self.write_depth == 0:
+            self.bump_generation()
+
+    def bump_generation(self) -> None:
+        generation = (self.get_generation() + 1) & 0xFFFFFFFF
+        struct.pack_into(GENERATION_FORMAT, self.header, 0, generation)
+
+    def read_snapshot(self) -> tuple[int, bytes, int, int, int]|None:
+        """
+        Copies the cells and cursor if the interpreter is not mid-write.
+
+        Returns (generation, cells, column, row, interpreter flags) or None
+        if the copy would have been torn.
+        """
+        before, col, row, flags, _ = struct.unpack_from(
+            HEADER_FORMAT, self.header, 0)
+        if before % 2 == 1:
+            return None
+        cells = bytes(self.cells)
+        if self.get_generation() != before:
+            return None
+        return before, cells, col, row, flags
+
+    def set_cursor(self, col: int, row: int) -> None:
+        struct.pack_into('<HH', self.header, 4, col, row)
+
+    def get_interpreter_flag(self, flag: int) -> bool:
+        return bool(self.header[INTERPRETER_FLAGS_OFFSET] & flag)
+
+    def set_interpreter_flag(self, flag: int, state: bool) -> None:
+        self.set_flag(INTERPRETER_FLAGS_OFFSET, flag, state)
+
+    def get_renderer_flag(self, flag: int) -> bool:
+        return bool(self.header[RENDERER_FLAGS_OFFSET] & flag)
+
+    def set_renderer_flag(self, flag: int, state: bool) -> None:
+        self.set_flag(RENDERER_FLAGS_OFFSET, flag, state)
+
+    def set_flag(self, offset: int, flag: int, state: bool) -> None:
+        flags = self.header[offset]
+        self.header[offset] = flags | flag if state else flags & ~flag
+
+    def close(self) -> None:
+        """ Releases the views and the block (removing it if we own it). """
+        self.header.release()
+        self.cells.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
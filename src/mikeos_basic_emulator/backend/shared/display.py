@@ -0,0 +1,245 @@
+# This is the interpreter side of the out-of-process renderer.
+# Screen state is written to shared memory and drawn by another process.
+
+import multiprocessing
+import string
+
+from backend.interface.area import Area, Position
+from backend.interface.colours import (
+    PalettePair,
+    int_to_palette_pair,
+    palette_pair_to_int,
+)
+from backend.interface.dialog import DialogBox, FileSelector, Listbox
+from backend.interface.display import TextDisplay
+from backend.pygame.cursor import Cursor
+from backend.shared.buffer import (
+    FLAG_CURSOR_VISIBLE,
+    FLAG_INTERPRETER_EXITED,
+    FLAG_RENDERER_EXITED,
+    SharedTextBuffer,
+)
+from backend.shared.renderer import run_renderer
+from constants import (
+    DEFAULT_BACKGROUND_COLOUR,
+    DEFAULT_COLUMNS,
+    DEFAULT_CURSOR_VISIBILITY,
+    DEFAULT_LINES,
+)
+from debugger import Debugger
+from filesystem import SFNDirectory
+from variables import VariableManager
+
+
+class SharedTextDisplay(TextDisplay):
+    """
+    A text display that is drawn by a separate renderer process.
+
+    The interpreter and pygame no longer share a GIL, so heavy `PRINT`
+    output and drawing each get their own core.
+
+    Cells are written to a `SharedTextBuffer` and the renderer polls its
+    generation counter. Key presses come back from the renderer over a pipe.
+    """
+    def __init__(self, variables: VariableManager, debugger: Debugger) -> None:
+        self.variables = variables
+        self.debugger = debugger
+        self.columns = DEFAULT_COLUMNS
+        self.lines = DEFAULT_LINES
+        self.default_colour = DEFAULT_BACKGROUND_COLOUR
+        self.cursor = Cursor(limits=Position(self.columns, self.lines))
+        self.buffer = SharedTextBuffer(self.columns, self.lines)
+        self.buffer_open = True
+        self.finished = False
+        self.process: multiprocessing.process.BaseProcess|None = None
+        self.key_pipe, self.renderer_pipe = multiprocessing.Pipe(duplex=False)
+        self.fill_cells(0, self.columns * self.lines, ' ', self.default_colour)
+        self.set_cursor_visible(DEFAULT_CURSOR_VISIBILITY)
+
+    def open_window(self) -> None:
+        # The renderer is spawned so it starts without our pygame state.
+        context = multiprocessing.get_context('spawn')
+        self.process = context.Process(
+            target=run_renderer,
+            args=(self.buffer.get_name(), self.renderer_pipe),
+            daemon=True,
+        )
+        self.process.start()
+
+    def update(self) -> None:
+        # Drawing is done by the renderer process.
+        pass
+
+    def write_cell(self, offset: int, char: str, colour: PalettePair) -> None:
+        cells = self.buffer.cells
+        cells[offset * 2] = char.encode('cp437', 'replace')[0]
+        cells[offset * 2 + 1] = palette_pair_to_int(colour)
+
+    def fill_cells(self, start: int, end: int,
+        char: str, colour: PalettePair) -> None:
+
+        cell = char.encode('cp437', 'replace')[:1] + \
+            bytes([palette_pair_to_int(colour)])
+        self.buffer.begin_write()
+        self.buffer.cells[start * 2:end * 2] = cell * (end - start)
+        self.buffer.end_write()
+
+    def publish_cursor(self) -> None:
+        self.buffer.set_cursor(self.cursor.col, self.cursor.row)
+
+    def move_cursor(self, position: Position) -> None:
+        self.buffer.begin_write()
+        self.cursor.move(position)
+        self.publish_cursor()
+        self.buffer.end_write()
+
+    def advance_cursor(self) -> None:
+        self.buffer.begin_write()
+        self.cursor.advance()
+        if self.cursor.wants_scroll():
+            self.scroll()
+        self.publish_cursor()
+        self.buffer.end_write()
+
+    def scroll(self) -> None:
+        row_bytes = self.columns * 2
+        self.buffer.begin_write()
+        cells = self.buffer.cells
+        cells[:-row_bytes] = cells[row_bytes:]
+        self.buffer.end_write()
+        self.fill_cells((self.lines - 1) * self.columns,
+            self.lines * self.columns, ' ', self.default_colour)
+        self.cursor.need_scroll = False
+
+    def set_cursor_visible(self, state: bool) -> None:
+        self.buffer.begin_write()
+        self.buffer.set_interpreter_flag(FLAG_CURSOR_VISIBLE, state)
+        self.buffer.end_write()
+
+    def show_cursor(self) -> None:
+        self.set_cursor_visible(True)
+
+    def hide_cursor(self) -> None:
+        self.set_cursor_visible(False)
+
+    def get_cursor_position(self) -> Position:
+        return self.cursor.get_position()
+
+    def get_character_at_cursor(self) -> str:
+        offset = self.cursor.get_offset() * 2
+        return bytes(self.buffer.cells[offset:offset + 1]).decode('cp437')
+
+    def get_character_colour_at_cursor(self) -> PalettePair:
+        offset = self.cursor.get_offset() * 2
+        return int_to_palette_pair(self.buffer.cells[offset + 1])
+
+    def input_string(self, prompt: str = '') -> str:
+        if prompt != '':
+            self.print(prompt)
+        output = ''
+        key = ''
+        while key != 13:
+            key = self.read_char()
+            if key == 13:
+                continue
+            elif chr(key) in string.printable:
+                self.print(chr(key))
+                output += chr(key)
+        self.newline()
+        return output
+
+    def read_char(self, is_blocking: bool = True) -> int:
+        key = 0
+        while key == 0:
+            if self.key_pipe.poll(0.1 if is_blocking else 0):
+                key = self.key_pipe.recv()
+            if self.has_exited():
+                raise SystemExit
+            if not is_blocking:
+                return key
+        return key
+
+    def newline(self) -> None:
+        self.buffer.begin_write()
+        self.cursor.newline()
+        if self.cursor.wants_scroll():
+            self.scroll()
+        self.publish_cursor()
+        self.buffer.end_write()
+
+    def print(self, text: str, colour: PalettePair|None = None) -> None:
+        self.debugger.print_hook(text)
+        colour = colour or self.default_colour
+        self.buffer.begin_write()
+        for char in text:
+            if char == '\n':
+                self.newline()
+            else:
+                self.write_cell(self.cursor.get_offset(), char, colour)
+                self.advance_cursor()
+        self.publish_cursor()
+        self.buffer.end_write()
+
+    def clear_screen(self) -> None:
+        self.fill_cells(0, self.columns * self.lines, ' ', self.default_colour)
+        self.move_cursor(Position(0, 0))
+
+    def has_exited(self) -> bool:
+        if self.finished:
+            return True
+        if self.buffer.get_renderer_flag(FLAG_RENDERER_EXITED):
+            self.finished = True
+        return self.finished
+
+    def show_alert_dialog(self, message: str) -> None:
+        alert_dialog = DialogBox(self, self.variables)
+        alert_dialog.set_message(message)
+        alert_dialog.run()
+
+    def show_list_dialog(self,
+        list_items: list[str],
+        prompt_line_1: str,
+        prompt_line_2: str,
+    ) -> int:
+
+        list_dialog = Listbox(self, self.variables)
+        list_dialog.set_items(list_items)
+        list_dialog.set_prompts(prompt_line_1, prompt_line_2)
+        return list_dialog.run()
+
+    def show_file_dialog(self, filesystem: SFNDirectory) -> str:
+        file_dialog = FileSelector(self, self.variables, filesystem)
+        return file_dialog.run()
+
+    def fill_area(self,
+        area: Area,
+        char: str,
+        colour: PalettePair) -> None:
+
+        self.buffer.begin_write()
+        for y in range(area.start.row, area.end.row + 1):
+            start = y * self.columns + area.start.col
+            self.fill_cells(start, start + area.end.col - area.start.col + 1,
+                char, colour)
+        self.buffer.end_write()
+
+    def handle_events(self) -> None:
+        if self.process is not None and not self.process.is_alive():
+            self.finished = True
+
+    def exit(self) -> None:
+        self.finished = True
+        if not self.buffer_open:
+            return
+        self.buffer_open = False
+        self.buffer.set_interpreter_flag(FLAG_INTERPRETER_EXITED, True)
+        if self.process is not None:
+            self.process.join(timeout=1)
+        self.buffer.close()
+
+    def set_print_colour(self, colour: PalettePair) -> None:
+        self.default_colour = colour
+        self.variables.set_palette_variable('text', colour)
+
+    def get_print_colour(self) -> PalettePair:
+        return self.default_colour
@@ -0,0 +1,89 @@
+# This is the renderer side of the out-of-process renderer.
+# It draws the shared text buffer with pygame and sends key presses back.
+
+import queue
+import time
+import typing
+from multiprocessing.connection import Connection
+
+if typing.TYPE_CHECKING:
+    from backend.pygame.display import PygameTextDisplay
+
+from backend.interface.area import Position
+from backend.interface.colours import int_to_palette_pair
+from backend.shared.buffer import (
+    FLAG_CURSOR_VISIBLE,
+    FLAG_INTERPRETER_EXITED,
+    FLAG_RENDERER_EXITED,
+    SharedTextBuffer,
+)
+from constants import DEFAULT_COLUMNS, DEFAULT_LINES
+
+# The renderer polls at roughly the display refresh rate.
+FRAME_INTERVAL = 1 / 60
+
+
+def run_renderer(buffer_name: str, key_pipe: Connection) -> None:
+    """
+    Entry point of the renderer process.
+
+    Draws the buffer whenever its generation changes and forwards any
+    keys from the pygame keyboard handler to the interpreter.
+    """
+    # Imported here so only the renderer process starts pygame.
+    from backend.pygame.display import PygameTextDisplay
+    from debugger import Debugger
+    from memory import Memory
+    from variables import VariableManager
+
+    debugger = Debugger()
+    display = PygameTextDisplay(VariableManager(Memory(), debugger), debugger)
+    display.open_window()
+    buffer = SharedTextBuffer(DEFAULT_COLUMNS, DEFAULT_LINES, buffer_name)
+    drawn_generation = -1
+    drawn_cells = b''
+
+    try:
+        while not buffer.get_interpreter_flag(FLAG_INTERPRETER_EXITED):
+            display.handle_events()
+            if display.has_exited():
+                break
+            forward_keys(display.keyboard.key_queue, key_pipe)
+
+            snapshot = buffer.read_snapshot()
+            if snapshot is not None and snapshot[0] != drawn_generation:
+                generation, cells, col, row, flags = snapshot
+                draw_cells(display, drawn_cells, cells)
+                display.cursor_visible = bool(flags & FLAG_CURSOR_VISIBLE)
+                display.move_cursor(Position(col, row))
+                drawn_generation = generation
+                drawn_cells = cells
+
+            display.update()
+            time.sleep(FRAME_INTERVAL)
+    finally:
+        buffer.set_renderer_flag(FLAG_RENDERER_EXITED, True)
+        buffer.close()
+        display.exit()
+
+def forward_keys(key_queue: queue.Queue[int], key_pipe: Connection) -> None:
+    while True:
+        try:
+            key = key_queue.get(block=False)
+        except queue.Empty:
+            return
+        key_pipe.send(key)
+
+def draw_cells(display: 'PygameTextDisplay',
+    old_cells: bytes,
+    new_cells: bytes) -> None:
+
+    """ Updates the pygame characters for cells that have changed. """
+    for offset in range(0, len(new_cells), 2):
+        cell = new_cells[offset:offset + 2]
+        if old_cells[offset:offset + 2] == cell:
+            continue
+        display.characters[offset // 2].set_char_and_colour(
+            cell[:1].decode('cp437'),
+            int_to_palette_pair(cell[1]),
+        )
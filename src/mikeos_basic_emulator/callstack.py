@@ -0,0 +1,42 @@
+# This is the GOSUB call stack of the MikeOS Basic Emulator.
+# It holds return addresses in a fixed number of slots.
+
+class CallStack:
+    """
+    A stack of return addresses with a fixed capacity.
+
+    The slots are made once, up front, so GOSUB and RETURN just store or
+    load a slot and move `depth`. A program that recurses without end
+    fills the stack and stops with an error, rather than using more and
+    more memory until it's killed.
+    """
+    def __init__(self, capacity: int) -> None:
+        self.capacity = capacity
+        self.addresses = [0] * capacity
+        self.depth = 0
+
+    def __len__(self) -> int:
+        return self.depth
+
+    def is_full(self) -> bool:
+        return self.depth >= self.capacity
+
+    def push(self, address: int) -> None:
+        """ Adds a return address. Check `is_full()` first. """
+        self.addresses[self.depth] = address
+        self.depth += 1
+
+    def pop(self) -> int:
+        """ Removes the newest return address. Check the length first. """
+        self.depth -= 1
+        return self.addresses[self.depth]
+
+    def get_addresses(self) -> list[int]:
+        """ Returns a copy of the addresses, oldest first. """
+        return self.addresses[:self.depth]
+
+    def set_addresses(self, addresses: list[int]) -> None:
+        """ Replaces the stack, e.g. when the debugger restores a snapshot. """
+        addresses = addresses[:self.capacity]
+        self.addresses[:len(addresses)] = addresses
+        self.depth = len(addresses)
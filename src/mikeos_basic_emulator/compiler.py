@@ -0,0 +1,369 @@
+# This is the compiler of the MikeOS Basic Emulator.
+# It looks over a loaded program once, before it runs, to match its blocks.
+
+from array import array
+from typing import NamedTuple
+
+from argument import CommandArgument
+from constants import STRICT_COMPATIBILITY
+from memory import Memory
+from parser import CommandParser, DecodingError, Token, TokenType
+from variables import ForVariable, VariableManager
+
+# Lines are read the same way as the interpreter's `read_line()` does.
+MAX_LINE_LENGTH = 255
+
+# The fewest IF ... THEN GOTO lines in a row that are made a dispatch.
+MIN_DISPATCH_LINES = 2
+
+class ProgramLine(NamedTuple):
+    """ A line of the program, parsed once when it's compiled. """
+    number: int
+    address: int
+    next_address: int
+    text: str
+    # None if the line doesn't parse, the interpreter reports it if run.
+    tokens: list[Token]|None
+
+
+class DispatchChain:
+    """
+    A run of lines like `IF A = 1 THEN GOTO label`, all testing the same
+    variable against a constant, which is run as one dictionary lookup.
+
+    `targets` maps each value to the line that tests it and the argument
+    to jump to. If a value is tested twice the first line wins, as it
+    would when the lines are run one by one. A value that isn't there
+    carries on at `end_address`, the line after the chain.
+    """
+    def __init__(self, variable: str) -> None:
+        self.variable = variable
+        self.targets: dict[int, tuple[int, CommandArgument]] = {}
+        self.last_address = 0
+        self.end_address = 0
+        self.length = 0
+
+
+class CompiledProgram:
+    """
+    What the compiler found out about the program in memory.
+
+    `source` is the program as it was compiled and `lines` maps the
+    address of each line to the parsed line.
+
+    DO/LOOP and FOR/NEXT blocks are matched by position, like brackets:
+    - `loop_targets` maps each LOOP to the line after its DO.
+      The matched DOs are in `do_lines`, they don't push anything on the
+      DO stack, so each LOOP is a direct jump.
+    - `for_loops` has a ForVariable for each FOR, with the line after it
+      as the loop start. It's reused each time the loop is entered.
+      `next_loops` maps each NEXT to the same ForVariable, so the runner
+      can count the loop without reading the NEXT line.
+
+    A LOOP or NEXT after THEN or ELSE jumps back to the innermost open
+    block of its kind (like `continue`) but doesn't close it.
+
+    An IF with nothing after THEN starts an IF block, which may have an
+    ELSE line and ends with ENDIF:
+    - `if_targets` maps each IF to where it goes if it's false, the line
+      after the ELSE or ENDIF.
+    - `else_targets` maps each ELSE to the line after the ENDIF, as it's
+      reached at the end of the true part.
+    So the part that isn't run is jumped over, not read line by line.
+    IF blocks aren't in MikeOS, so they aren't matched in strict mode.
+
+    `dispatch_chains` maps the first line of each DispatchChain to it,
+    for menus and state machines written as IF ... THEN GOTO lines.
+
+    `data_blocks` maps the label of each block of numbers that READ uses
+    to the numbers, as 16-bit words. The numbers are on the line after
+    the label. Blocks that hold more than literal numbers (e.g. variables)
+    are added by READ the first time it uses them, as they were before.
+
+    Blocks that don't match are described in `errors`. They're left to
+    the DO stack and `for_variables` at run time, as before.
+    """
+    def __init__(self, start: int, size: int) -> None:
+        self.start = start
+        self.size = size
+        self.source = b''
+        self.lines: dict[int, ProgramLine] = {}
+        self.loop_targets: dict[int, int] = {}
+        self.do_lines: set[int] = set()
+        self.for_loops: dict[int, ForVariable] = {}
+        self.next_loops: dict[int, ForVariable] = {}
+        self.if_targets: dict[int, int] = {}
+        self.else_targets: dict[int, int] = {}
+        self.dispatch_chains: dict[int, DispatchChain] = {}
+        self.data_blocks: dict[str, 'array[int]'] = {}
+        self.errors: list[str] = []
+
+    def add_error(self, line: ProgramLine, message: str) -> None:
+        self.errors.append(f'Line {line.number}: {message}')
+
+
+class ProgramCompiler:
+    """
+    Compiles the program between the load point and the end of the program.
+
+    Nothing here changes what the program does, it only finds things out
+    ahead of time that the interpreter would otherwise work out each time
+    a line runs.
+    """
+    def __init__(self, memory: Memory, variables: VariableManager) -> None:
+        self.memory = memory
+        self.variables = variables
+        self.parser = CommandParser()
+
+    def compile(self, start: int, size: int) -> CompiledProgram:
+        program = CompiledProgram(start, size)
+        self.read_lines(program)
+        self.match_blocks(program)
+        if not STRICT_COMPATIBILITY:
+            self.match_if_blocks(program)
+        self.find_dispatch_chains(program)
+        self.read_data_blocks(program)
+        return program
+
+    def read_lines(self, program: CompiledProgram) -> None:
+        # Read straight from the buffer, as compiling isn't the program
+        # reading itself (so watchpoints and the profiler don't see it).
+        end = program.start + program.size
+        program.source = bytes(self.memory.data[program.start:end])
+        text = program.source.decode('cp437', 'replace')
+        address = program.start
+        for number, line in enumerate(text.split('\n'), 1):
+            next_address = min(address + len(line) + 1, end)
+            line = line[:MAX_LINE_LENGTH]
+            try:
+                tokens: list[Token]|None = self.parser.parse(line)
+            except DecodingError:
+                tokens = None
+            program.lines[address] = ProgramLine(
+                number, address, next_address, line, tokens)
+            address = next_address
+            if address >= end:
+                break
+
+    def match_blocks(self, program: CompiledProgram) -> None:
+        do_stack: list[ProgramLine] = []
+        for_stack: list[tuple[str, ProgramLine]] = []
+        for line in program.lines.values():
+            if not line.tokens:
+                continue
+            word = get_word(line.tokens, 0)
+            if word == 'DO':
+                do_stack.append(line)
+            elif word == 'LOOP':
+                if len(do_stack) == 0:
+                    program.add_error(line, 'LOOP without DO')
+                    continue
+                do_line = do_stack.pop()
+                program.do_lines.add(do_line.address)
+                program.loop_targets[line.address] = do_line.next_address
+            elif word == 'FOR':
+                variable = get_variable(line.tokens, 1)
+                if variable is not None:
+                    for_stack.append((variable, line))
+            elif word == 'NEXT':
+                variable = get_variable(line.tokens, 1)
+                if len(for_stack) == 0 or for_stack[-1][0] != variable:
+                    program.add_error(line, f'NEXT without FOR: {variable}')
+                    continue
+                _, for_line = for_stack.pop()
+                self.add_for_loop(program, for_line, line, variable)
+
+            tail = find_tail(line.tokens)
+            tail_word = get_word(line.tokens, tail)
+            if tail_word == 'LOOP':
+                if len(do_stack) == 0:
+                    program.add_error(line, 'LOOP without DO')
+                else:
+                    program.loop_targets[line.address] = \
+                        do_stack[-1].next_address
+            elif tail_word == 'NEXT':
+                variable = get_variable(line.tokens, tail + 1)
+                if all(name != variable for name, _ in for_stack):
+                    program.add_error(line, f'NEXT without FOR: {variable}')
+
+        for line in do_stack:
+            program.add_error(line, 'DO without LOOP')
+        for variable, line in for_stack:
+            program.add_error(line, f'FOR without NEXT: {variable}')
+
+    def match_if_blocks(self, program: CompiledProgram) -> None:
+        # Each open block is its IF line and its ELSE line, if it's had one.
+        if_stack: list[tuple[ProgramLine, ProgramLine|None]] = []
+        for line in program.lines.values():
+            if not line.tokens:
+                continue
+            word = get_word(line.tokens, 0)
+            if word == 'IF' and find_tail(line.tokens) == len(line.tokens):
+                if_stack.append((line, None))
+            elif word == 'ELSE' and len(line.tokens) == 1:
+                if len(if_stack) == 0 or if_stack[-1][1] is not None:
+                    program.add_error(line, 'ELSE without IF')
+                    continue
+                if_stack[-1] = (if_stack[-1][0], line)
+            elif word == 'ENDIF':
+                if len(if_stack) == 0:
+                    program.add_error(line, 'ENDIF without IF')
+                    continue
+                if_line, else_line = if_stack.pop()
+                if else_line is None:
+                    program.if_targets[if_line.address] = line.next_address
+                else:
+                    program.if_targets[if_line.address] = \
+                        else_line.next_address
+                    program.else_targets[else_line.address] = \
+                        line.next_address
+
+        for if_line, _ in if_stack:
+            program.add_error(if_line, 'IF without ENDIF')
+
+    def find_dispatch_chains(self, program: CompiledProgram) -> None:
+        chain: DispatchChain|None = None
+        first_address = 0
+        for line in program.lines.values():
+            test = get_goto_test(line.tokens)
+            if chain is not None and (test is None or
+                test[0] != chain.variable):
+                self.add_dispatch_chain(program, first_address, chain)
+                chain = None
+            if test is None:
+                continue
+            variable, value, target = test
+            if chain is None:
+                chain = DispatchChain(variable)
+                first_address = line.address
+            if value not in chain.targets:
+                chain.targets[value] = (line.address,
+                    CommandArgument(target, self.variables))
+            chain.last_address = line.address
+            chain.end_address = line.next_address
+            chain.length += 1
+        if chain is not None:
+            self.add_dispatch_chain(program, first_address, chain)
+
+    def add_dispatch_chain(self,
+        program: CompiledProgram,
+        address: int,
+        chain: DispatchChain) -> None:
+
+        if chain.length >= MIN_DISPATCH_LINES:
+            program.dispatch_chains[address] = chain
+
+    def read_data_blocks(self, program: CompiledProgram) -> None:
+        names = get_read_labels(program)
+        lines = list(program.lines.values())
+        for label_line, data_line in zip(lines, lines[1:]):
+            name = get_label(label_line.tokens, 0)
+            if (name is None or name not in names or
+                name in program.data_blocks or
+                len(label_line.tokens or []) != 1):
+                continue
+            values = get_data_values(data_line.tokens)
+            if values is not None:
+                program.data_blocks[name] = values
+
+    def add_for_loop(self,
+        program: CompiledProgram,
+        for_line: ProgramLine,
+        next_line: ProgramLine,
+        variable: str) -> None:
+
+        for_loop = ForVariable(variable, self.variables)
+        for_loop.set_loop_start_position(for_line.next_address)
+        program.for_loops[for_line.address] = for_loop
+        program.next_loops[next_line.address] = for_loop
+
+
+def get_read_labels(program: CompiledProgram) -> set[str]:
+    """ Returns the name of each label used by a READ in the program. """
+    names: set[str] = set()
+    for line in program.lines.values():
+        if not line.tokens:
+            continue
+        for start in (0, find_tail(line.tokens)):
+            if get_word(line.tokens, start) == 'READ':
+                name = get_label(line.tokens, start + 1)
+                if name is not None:
+                    names.add(name)
+    return names
+
+def get_word(tokens: list[Token], index: int) -> str|None:
+    """ Returns the word at the index in upper case, or None. """
+    if 0 <= index < len(tokens) and tokens[index].type == TokenType.WORD:
+        return tokens[index].value.upper()
+    return None
+
+def get_variable(tokens: list[Token], index: int) -> str|None:
+    """ Returns the numeric variable at the index, or None. """
+    if 0 <= index < len(tokens) and tokens[index].type == TokenType.VARIABLE:
+        return tokens[index].value
+    return None
+
+def get_goto_test(tokens: list[Token]|None) -> tuple[str, int, Token]|None:
+    """
+    Checks for `IF <variable> = <number or character> THEN GOTO <label>`.
+    Returns the variable, the value and the label token, or None.
+    """
+    if (tokens is None or len(tokens) != 7 or
+        get_word(tokens, 0) != 'IF' or
+        get_variable(tokens, 1) is None or
+        tokens[2] != Token(TokenType.SYMBOL, '=') or
+        get_word(tokens, 4) != 'THEN' or
+        get_word(tokens, 5) != 'GOTO' or
+        tokens[6].type not in (TokenType.WORD, TokenType.LABEL)):
+        return None
+    if tokens[3].type == TokenType.NUMBER:
+        value = tokens[3].value
+    elif tokens[3].type == TokenType.CHAR:
+        value = tokens[3].value[1].encode('cp437')[0]
+    else:
+        return None
+    return tokens[1].value, value, tokens[6]
+
+def get_label(tokens: list[Token]|None, index: int) -> str|None:
+    """ Returns the label at the index (without a colon), or None. """
+    if tokens is None or not 0 <= index < len(tokens):
+        return None
+    if tokens[index].type == TokenType.LABEL:
+        return tokens[index].value[:-1]
+    if tokens[index].type == TokenType.WORD:
+        return tokens[index].value
+    return None
+
+def get_data_values(tokens: list[Token]|None) -> 'array[int]|None':
+    """
+    Returns the numbers at the start of a data line, up to the first token
+    that isn't numeric. Returns None if any of them aren't literals.
+    """
+    values = array('H')
+    for token in tokens or []:
+        if token.type == TokenType.NUMBER:
+            values.append(token.value)
+        elif token.type == TokenType.CHAR:
+            values.append(token.value[1].encode('cp437')[0])
+        elif token.type in (TokenType.VARIABLE, TokenType.STRING_VAR_REF,
+            TokenType.WORD):
+            # Worked out when the program runs (a WORD may be a keyword).
+            return None
+        else:
+            break
+    return values
+
+def find_tail(tokens: list[Token], start: int = 0) -> int:
+    """
+    Returns the index of the command after THEN (for an IF) or ELSE, for
+    the command at the start index (the start of the line by default).
+    Returns -1 if the command doesn't have one.
+    """
+    word = get_word(tokens, start)
+    if word == 'ELSE':
+        return start + 1
+    if word == 'IF':
+        for index in range(start + 1, len(tokens)):
+            if get_word(tokens, index) == 'THEN':
+                return index + 1
+    return -1
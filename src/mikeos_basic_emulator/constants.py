@@ -31,6 +31,13 @@ The location within the simulated memory to store string variables.
 1024 bytes are reserved for string variables ($1-$8).
 """
 
+DEFAULT_MEMORY_BACKING_FILE: str = \
+    config["memory"]["backing_file"]
+"""
+A file to map the simulated memory onto, so other programs can see it.
+An empty string keeps the memory private to the emulator.
+"""
+
 # Emulation settings
 EMULATED_MIKEOS_VERSION: int = \
     config["emulation"]["mikeos_version"]
@@ -50,6 +57,76 @@ EMULATED_MIKEOS_COMMAND_LIST: List[str] = \
 These aren't implemented in the emulator, but are available in MikeOS.
 They're just shown in the help text before the program starts.
 """
+EMULATED_LINES_PER_SECOND: int = \
+    config["emulation"]["lines_per_second"]
+"""
+The number of program lines run each second.
+Games written for real hardware may need this to be playable.
+Zero runs the interpreter as fast as possible.
+"""
+
+STRICT_COMPATIBILITY: bool = \
+    config["emulation"]["strict_compatibility"]
+"""
+Turns off the emulator's extensions to the language.
+Programs that run in strict mode should run on real MikeOS too.
+This includes operator precedence, even if it's turned on.
+"""
+
+OPERATOR_PRECEDENCE: bool = \
+    config["emulation"]["operator_precedence"]
+"""
+Works out sums with * / % before + - and with brackets.
+It's off by default, so sums are worked out from left to right without
+brackets, as MikeOS does (so 2 + 3 * 4 is 20, not 14).
+"""
+
+GOSUB_DEPTH_LIMIT: int = \
+    config["emulation"]["gosub_depth_limit"]
+"""
+The most GOSUBs that can be waiting to RETURN at once.
+Going deeper stops the program with a stack overflow error, which is
+usually a GOSUB that should have been a GOTO or recursion that never ends.
+"""
+
+# Debugger settings
+DEBUGGER_ENABLED: bool = \
+    config["debugger"]["enabled"]
+"""
+Logs every command, variable assignment and PRINT at the debug level.
+When off the interpreter skips the logging hooks entirely.
+"""
+
+DEBUGGER_REWIND_INTERVAL: int = \
+    config["debugger"]["rewind_interval"]
+"""
+How many program lines are run between debugger snapshots.
+Stepping back restores the nearest snapshot and re-runs lines from there,
+so a smaller interval makes stepping back quicker but costs more memory.
+Zero turns snapshots off.
+"""
+
+DEBUGGER_REWIND_BUDGET: int = \
+    config["debugger"]["rewind_budget"]
+"""
+The most memory (in bytes) the snapshot history may use.
+The oldest snapshots are dropped to stay under it.
+"""
+
+# Profiler settings
+PROFILE_MEMORY: bool = \
+    config["profiler"]["enabled"]
+"""
+Counts the reads and writes of each memory address.
+A heatmap is saved when the program exits.
+"""
+
+MEMORY_HEATMAP_FILE: str = \
+    config["profiler"]["heatmap_file"]
+"""
+Where the memory heatmap is saved.
+A `.csv` file gets a table of counts, anything else a PNG image.
+"""
 
 # Display settings
 DEFAULT_COLUMNS: int = \
@@ -100,6 +177,14 @@ DEFAULT_PRINT_COLOUR: PalettePair = \
 The default colour for printing text to the screen if not changed.
 """
 
+DEFAULT_SEPARATE_RENDER_PROCESS: bool = \
+    config["display"]["separate_render_process"]
+"""
+If the display should be drawn by a separate renderer process.
+Screen cells are shared with it through shared memory.
+This stops heavy printing and drawing from slowing each other down.
+"""
+
 # Cursor settings
 DEFAULT_CURSOR_BLINK_INTERVAL: float = \
     config["cursor"]["blink_interval"]
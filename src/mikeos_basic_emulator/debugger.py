@@ -2,10 +2,16 @@
 # It's responsible for logging output and debugging information.
 
 import typing
+from typing import Callable
 import logging
+import threading
 
 if typing.TYPE_CHECKING:
     from environment import Environment
+    from memory import Watchpoint
+
+from constants import DEBUGGER_REWIND_BUDGET, DEBUGGER_REWIND_INTERVAL
+from snapshots import SnapshotRing
 
 log = logging.getLogger(__name__)
 
@@ -25,44 +31,83 @@ class Debugger:
     - The program finishes.
     - A syntax or logic error occurs.
     - Unsupported commands like `CALL` are used.
+    - A memory watchpoint is hit.
     
+    If rewinding is turned on, snapshots of memory and the interpreter are
+    taken as the program runs, so the REPL can step back.
+
+    The interpreter reports variables, commands and prints through hooks.
+    A hook is None while nothing would be logged, so the interpreter skips
+    the call (and formatting the message) entirely. `update_hooks()` binds
+    or unbinds them whenever debugging or a message type is toggled.
+    Info and warning messages are rare so they always go to the logger.
+
+    Messages may come from the interpreter and main threads at once.
+    The list of shown types is replaced rather than changed in place, so
+    it can be read without a lock. Printing is locked so lines don't mix.
     """
     def __init__(self) -> None:
         self.show_prints = False
         self.enabled = False
         self.last_print = ''
         self.show_types: list[str] = []
+        self.print_lock = threading.Lock()
         self.finished = False
         self.run_debugger_on_exit = False
+        self.snapshots: SnapshotRing|None = None
+        if DEBUGGER_REWIND_INTERVAL > 0:
+            self.snapshots = SnapshotRing(
+                DEBUGGER_REWIND_INTERVAL, DEBUGGER_REWIND_BUDGET)
+        self.set_variable_hook: Callable[[str, int], None]|None = None
+        self.command_hook: Callable[[str], None]|None = None
+        # Always bound, as the REPL shows the last PRINT.
+        self.print_hook: Callable[[str], None] = self.remember_print
+
+    def update_hooks(self) -> None:
+        """ Binds the hooks that have something to log, unbinds the rest. """
+        self.set_variable_hook = \
+            self.log_set_variable if self.is_logging('SET') else None
+        self.command_hook = \
+            self.log_command if self.is_logging('COMMAND') else None
+        if self.show_prints or self.is_logging('PRINT'):
+            self.print_hook = self.log_print
+        else:
+            self.print_hook = self.remember_print
+
+    def is_logging(self, msgtype: str) -> bool:
+        return self.enabled or msgtype in self.show_types
 
     def debug(self, msgtype: str, message: str) -> None:
         if self.enabled:
-            log.debug(f'{msgtype}: {message}')
+            log.debug('%s: %s', msgtype, message)
         if msgtype in self.show_types:
-            print(f'{msgtype}: {message}')
+            self.show(f'{msgtype}: {message}')
             
     def info(self, msgtype: str, message: str) -> None:
-        
-        if self.enabled:
-            log.info(f'{msgtype}: {message}')
+        log.info('%s: %s', msgtype, message)
         if msgtype in self.show_types:
-            print(f'{msgtype}: {message}')
+            self.show(f'{msgtype}: {message}')
 
     def warning(self, msgtype: str, message: str) -> None:
-        if self.enabled:
-            log.warning(f'{msgtype}: {message}')
+        log.warning('%s: %s', msgtype, message)
         if msgtype in self.show_types:
-            print(f'{msgtype}: {message}')
+            self.show(f'{msgtype}: {message}')
 
     def error(self, msgtype: str, message: str) -> None:
         log.error(f'{msgtype}: {message}')
-        print(f'{msgtype}: {message}')
+        self.show(f'{msgtype}: {message}')
+
+    def show(self, text: str) -> None:
+        with self.print_lock:
+            print(text)
 
     def enable_type(self, msgtype: str) -> None:
-        self.show_types.append(msgtype)
+        self.show_types = self.show_types + [msgtype]
+        self.update_hooks()
         
     def disable_type(self, msgtype: str) -> None:
-        self.show_types.remove(msgtype)
+        self.show_types = [t for t in self.show_types if t != msgtype]
+        self.update_hooks()
 
     def enable_debug_on_exit(self) -> None:
         """ Enters the REPL loop when the program finishes. """
@@ -74,27 +119,34 @@ class Debugger:
     def enable(self) -> None:
         """ Enables debug printing and logging. """
         self.enabled = True
+        self.update_hooks()
 
     def disable(self) -> None:
         self.enabled = False
+        self.update_hooks()
     
     def enable_prints(self) -> None:
         self.show_prints = True
+        self.update_hooks()
     
     def disable_prints(self) -> None:
         self.show_prints = False
+        self.update_hooks()
+
+    def remember_print(self, message: str) -> None:
+        self.last_print = message
 
     def log_print(self, message: str) -> None:
         if self.show_prints:
-            print(f'PRINT: "{message}"')
+            self.show(f'PRINT: "{message}"')
         self.debug('PRINT', message)
         self.last_print = message
 
     def log_set_variable(self, variable: str, value: int) -> None:
-        self.debug(f'SET', f'{variable} = {value}')
+        self.debug('SET', f'{variable} = {value}')
         
     def log_command(self, command: str) -> None:
-        self.debug(f'COMMAND', f'{command}')
+        self.debug('COMMAND', f'Running command: "{command}"')
         
     def log_command_register(self, command: str) -> None:
         self.debug(f'REGISTER', f'COMMAND: {command}')
@@ -123,6 +175,68 @@ class Debugger:
         print('Breakpoint hit.')
         self.repl(env)
         
+    def on_watchpoint(self,
+        env: 'Environment',
+        watchpoint: 'Watchpoint',
+        address: int,
+        length: int,
+        is_write: bool) -> None:
+        """
+        Called when memory covered by a watchpoint is read or written.
+        """
+        access = 'Write to' if is_write else 'Read from'
+        self.show(f'WATCH: {access} {address:04X}-{address + length - 1:04X}'
+            f' (watching {watchpoint.start:04X}-{watchpoint.end - 1:04X})'
+            f' on line at {env.program_counter:04X}')
+        self.breakpoint(env)
+
+    def watch_command(self, env: 'Environment', args: list[str]) -> None:
+        """
+        Adds, lists or deletes watchpoints from the REPL.
+        - w <start> <end> [r|w|rw] = watch hex addresses start to end
+        - w = list watchpoints
+        - w d <n> = delete watchpoint n
+        """
+        memory = env.memory
+        try:
+            if len(args) == 0:
+                for n, watchpoint in enumerate(memory.watchpoints):
+                    access = ('r' if watchpoint.on_read else '') + \
+                        ('w' if watchpoint.on_write else '')
+                    print(f'{n}: {watchpoint.start:04X}-'
+                        f'{watchpoint.end - 1:04X} {access}')
+            elif args[0] == 'd':
+                memory.remove_watchpoint(memory.watchpoints[int(args[1])])
+            else:
+                access = args[2] if len(args) > 2 else 'w'
+                memory.add_watchpoint(int(args[0], 16), int(args[1], 16) + 1,
+                    on_read='r' in access, on_write='w' in access)
+        except (ValueError, IndexError):
+            print('Usage: w <start> <end> [r|w|rw], w, w d <n>')
+
+    def step_back(self, env: 'Environment', lines: int) -> None:
+        """
+        Goes back to the state from a number of program lines ago.
+
+        The nearest snapshot before then is restored and the lines after it
+        are run again. Anything they print is printed again and any input
+        they wait for has to be given again.
+        """
+        if self.snapshots is None:
+            print('Stepping back needs rewind_interval set in config.toml.')
+            return
+        target = max(self.snapshots.lines_run - lines,
+            self.snapshots.get_oldest_line())
+        if self.snapshots.rewind(env, target) == -1:
+            print('No snapshots to step back to.')
+            return
+        interpreter = env.get_command_runner()
+        while self.snapshots.lines_run < target:
+            self.snapshots.on_line(env)
+            interpreter.step()
+        print(f'Stepped back to line {env.next_line_address:04X}'
+            f' ({self.snapshots.lines_run} lines run).')
+
     def repl(self, env: 'Environment') -> None:
         """
         Gives the user a prompt to inspect the program state.
@@ -133,6 +247,8 @@ class Debugger:
         - p = print last PRINT
         - q = quit
         - v = view variables
+        - w = add, list or delete memory watchpoints
+        - b <n> = step back n program lines
         - .<command> = run a command in the interpreter
         """
         interpreter = env.get_command_runner()
@@ -150,7 +266,15 @@ class Debugger:
                 env.variables.dump_string_variables()
                 env.variables.dump_runtime_variables()
                 env.variables.dump_palette_variables()
+            elif cmd.startswith('b'):
+                try:
+                    self.step_back(env, int(cmd[1:] or 1))
+                except ValueError:
+                    print('Usage: b <lines>')
+            elif cmd == 'w' or cmd.startswith('w '):
+                self.watch_command(env, cmd.split()[1:])
             elif cmd.startswith('.'):
                 interpreter.run_command(cmd[1:])
             else:
-                print('Commands: c = continue, p = print last PRINT, q = quit')
\ No newline at end of file
+                print('Commands: c = continue, p = print last PRINT, q = quit'
+                    ', v = variables, w = watchpoints, b = step back')
\ No newline at end of file
@@ -1,21 +1,35 @@
 # Environment manager for the MikeOS Basic Emulator
 # This file ensures other parts can communicate with each other.
 
+import copy
 from pathlib import Path
 import time
 import typing
+from typing import NamedTuple
 
 if typing.TYPE_CHECKING:
     from runcmd import CommandRunner
-    from arglist import CommandArgumentList
 
+from backend.interface.colours import PalettePair
 from backend.interface.display import TextDisplay
 from variables import VariableManager, ForVariable
-from memory import Memory
+from memory import Memory, Watchpoint, WriteListener
 from backend.pygame.display import PygameTextDisplay
+from backend.shared.display import SharedTextDisplay
 #from backend.ncurses.display import CursesTextDisplay
+from callstack import CallStack
+from compiler import CompiledProgram, ProgramCompiler
+from constants import (
+    DEFAULT_LOAD_POINT,
+    DEFAULT_MEMORY_BACKING_FILE,
+    DEFAULT_SEPARATE_RENDER_PROCESS,
+    GOSUB_DEPTH_LIMIT,
+    PROFILE_MEMORY,
+)
 from debugger import Debugger
 from filesystem import SFNDirectory
+from flowgraph import ControlFlowGraph
+from profiler import ProfiledMemory
 from serialport import SerialPort
 from sound import Speaker
 
@@ -23,18 +37,48 @@ from sound import Speaker
 
 
 
+class InterpreterState(NamedTuple):
+    """ A copy of the interpreter state that isn't kept in memory. """
+    do_stack: list[int]
+    for_variables: dict[str, ForVariable]
+    gosub_stack: list[int]
+    condition_stack: list[bool]
+    program_counter: int
+    next_line_address: int
+    last_if_true: bool
+    runtime_variables: dict[str, int]
+    palette_variables: dict[str, PalettePair]
+
+
 class Environment():
     """
     This class hold the whole state of the emulator.
     It's passed to a command or debugger to connect all the other parts.
+
+    The interpreter state (memory, variables and the DO, FOR, GOSUB and
+    condition stacks) is owned by the interpreter thread. The debugger REPL
+    also runs on that thread, so none of it needs locking.
+    The main thread only touches the display, which has its own lock.
+
+    The program is compiled (see compiler.py) the first time it's needed.
+    It's compiled again if the program size changes or anything writes to
+    the program's memory.
     """
     def __init__(self) -> None:
-        self.memory = Memory()
+        self.memory: Memory
+        if PROFILE_MEMORY:
+            self.memory = ProfiledMemory(DEFAULT_MEMORY_BACKING_FILE)
+        else:
+            self.memory = Memory(DEFAULT_MEMORY_BACKING_FILE)
         self.debugger = Debugger()
+        self.memory.watch_handler = self.on_watchpoint
         self.variables = VariableManager(self.memory, self.debugger)
         #self.display: TextDisplay = CursesTextDisplay(
-        self.display: TextDisplay = PygameTextDisplay(
-            self.variables, self.debugger)
+        self.display: TextDisplay
+        if DEFAULT_SEPARATE_RENDER_PROCESS:
+            self.display = SharedTextDisplay(self.variables, self.debugger)
+        else:
+            self.display = PygameTextDisplay(self.variables, self.debugger)
         self.filesystem = SFNDirectory(Path('virtual_disk'), self.memory)
         self.serial_port = SerialPort('NULL')
         self.speaker = Speaker()
@@ -42,14 +86,16 @@ class Environment():
         self.command_runner: CommandRunner|None = None
         self.do_stack: list[int] = []
         self.for_variables: dict[str, ForVariable] = {}
-        self.gosub_stack: list[int] = []
+        self.gosub_stack = CallStack(GOSUB_DEPTH_LIMIT)
         self.condition_stack: list[bool] = []
         self.program_counter = 0
         self.program_finished = False
         self.next_line_address = 0
         self.last_if_true = True
-        self.read_blocks: dict[str, list[int]] = {}
-        self.next_command: CommandArgumentList|None = None
+        self.compiler = ProgramCompiler(self.memory, self.variables)
+        self.program: CompiledProgram|None = None
+        self.program_listener: WriteListener|None = None
+        self.graph: ControlFlowGraph|None = None
 
     def set_command_runner(self, command_runner: 'CommandRunner') -> None:
         self.command_runner = command_runner
@@ -59,6 +105,86 @@ class Environment():
             raise ValueError('Command runner is not set.')
         return self.command_runner
         
+    def load_program(self, program: str) -> None:
+        """
+        Puts the program text at the load point, ready to run from its
+        first line, like INCLUDE does with a file.
+        """
+        self.memory.write_string(DEFAULT_LOAD_POINT, program,
+            limit=len(program))
+        self.variables.set_runtime_variable('prog_size', len(program))
+        self.next_line_address = DEFAULT_LOAD_POINT
+
+    def get_program(self) -> CompiledProgram:
+        """
+        Returns the compiled program, compiling it if it's changed.
+
+        Writes to the program are normally reported by the memory. A shared
+        memory can be written by other processes too, so the program is
+        compared with what was compiled each time instead.
+        """
+        size = self.variables.get_runtime_variable('prog_size')
+        if (self.program is not None and self.memory.is_shared and
+            self.memory.data[DEFAULT_LOAD_POINT:DEFAULT_LOAD_POINT + size]
+                != self.program.source):
+            self.program = None
+        if self.program is None or self.program.size != size:
+            self.program = self.compiler.compile(DEFAULT_LOAD_POINT, size)
+            if self.program_listener is not None:
+                self.memory.remove_write_listener(self.program_listener)
+            self.program_listener = self.memory.add_write_listener(
+                DEFAULT_LOAD_POINT, DEFAULT_LOAD_POINT + size,
+                self.on_program_write)
+        return self.program
+
+    def get_graph(self) -> ControlFlowGraph:
+        """ Returns the control flow graph of the compiled program. """
+        program = self.get_program()
+        if self.graph is None or self.graph.program is not program:
+            self.graph = ControlFlowGraph(program, self.memory)
+        return self.graph
+
+    def on_program_write(self, address: int, length: int) -> None:
+        self.program = None
+
+    def on_watchpoint(self,
+        watchpoint: Watchpoint,
+        address: int,
+        length: int,
+        is_write: bool) -> None:
+        self.debugger.on_watchpoint(self, watchpoint, address, length, is_write)
+
+    def save_state(self) -> InterpreterState:
+        """
+        Copies the interpreter state, for the debugger to restore later.
+        Memory (and so the numeric and string variables) isn't included.
+        """
+        return InterpreterState(
+            list(self.do_stack),
+            {name: copy.copy(var) for name, var in self.for_variables.items()},
+            self.gosub_stack.get_addresses(),
+            list(self.condition_stack),
+            self.program_counter,
+            self.next_line_address,
+            self.last_if_true,
+            dict(self.variables.runtime_variables),
+            dict(self.variables.palette_variables),
+        )
+
+    def restore_state(self, state: InterpreterState) -> None:
+        """ Puts back the interpreter state from `save_state()`. """
+        self.do_stack = list(state.do_stack)
+        self.for_variables = {
+            name: copy.copy(var) for name, var in state.for_variables.items()
+        }
+        self.gosub_stack.set_addresses(state.gosub_stack)
+        self.condition_stack = list(state.condition_stack)
+        self.program_counter = state.program_counter
+        self.next_line_address = state.next_line_address
+        self.last_if_true = state.last_if_true
+        self.variables.runtime_variables = dict(state.runtime_variables)
+        self.variables.palette_variables = dict(state.palette_variables)
+
     def delay(self, seconds: float) -> None:
         intervals = seconds * 20
         for _ in range(int(intervals)):
@@ -0,0 +1,135 @@
+# This is the expression compiler of the MikeOS Basic Emulator.
+# It turns a numeric sum into a function, which is kept and run each time.
+
+from typing import Callable
+
+from argument import ArgumentError, CommandArgument
+from constants import OPERATOR_PRECEDENCE, STRICT_COMPATIBILITY
+from parser import TokenType
+
+Expression = Callable[[], int]
+
+ADDITIVE_OPERATORS = ['+', '-']
+MULTIPLICATIVE_OPERATORS = ['*', '/', '%']
+OPERATORS = ADDITIVE_OPERATORS + MULTIPLICATIVE_OPERATORS
+
+
+class ExpressionCompiler:
+    """
+    Compiles a numeric sum in a list of arguments into an Expression.
+
+    The sum is parsed by recursive descent:
+        sum     = product { ("+" | "-") product }
+        product = operand { ("*" | "/" | "%") operand }
+        operand = "(" sum ")" | number | variable | keyword | ...
+    So `2 + 3 * (4 - 1)` is 11, and brackets nest as deep as needed.
+
+    Precedence is only used if it's turned on in the config (and strict
+    compatibility is off). Otherwise the sum is worked out from left to
+    right without brackets, as MikeOS does, so `2 + 3 * 4` is 20.
+
+    Each operand is looked up when the expression runs, through the same
+    `to_numeric()` as `get_numeric()`, so errors are raised the same way.
+    Only literal numbers are looked up once, when it's compiled.
+    """
+    precedence = OPERATOR_PRECEDENCE and not STRICT_COMPATIBILITY
+
+    def __init__(self,
+        args: list[CommandArgument],
+        precedence: bool|None = None) -> None:
+
+        self.args = args
+        if precedence is not None:
+            self.precedence = precedence
+        self.index = 0
+
+    def compile(self, index: int) -> tuple[Expression, int]:
+        """
+        Compiles the sum starting at the argument index.
+
+        Returns the expression and the index of the argument after it.
+        """
+        self.index = index
+        if self.precedence:
+            expression = self.compile_sum()
+        else:
+            expression = self.compile_left_to_right()
+        # Anything but an operator is a syntax error, as it was before.
+        if self.has_symbol():
+            symbol = self.args[self.index].to_symbol()
+            raise ArgumentError(
+                f'Expected one of "{OPERATORS}" but got "{symbol}"')
+        return expression, self.index
+
+    def compile_left_to_right(self) -> Expression:
+        expression = self.compile_value()
+        while self.has_symbol(OPERATORS):
+            operator = self.args[self.index].to_symbol()
+            self.index += 1
+            expression = make_operation(
+                operator, expression, self.compile_value())
+        return expression
+
+    def compile_sum(self) -> Expression:
+        expression = self.compile_product()
+        while self.has_symbol(ADDITIVE_OPERATORS):
+            operator = self.args[self.index].to_symbol()
+            self.index += 1
+            expression = make_operation(
+                operator, expression, self.compile_product())
+        return expression
+
+    def compile_product(self) -> Expression:
+        expression = self.compile_operand()
+        while self.has_symbol(MULTIPLICATIVE_OPERATORS):
+            operator = self.args[self.index].to_symbol()
+            self.index += 1
+            expression = make_operation(
+                operator, expression, self.compile_operand())
+        return expression
+
+    def compile_operand(self) -> Expression:
+        if not self.has_symbol(['(']):
+            return self.compile_value()
+        self.index += 1
+        expression = self.compile_sum()
+        if not self.has_symbol([')']):
+            raise ArgumentError('Expected ")" to close the bracket')
+        self.index += 1
+        return expression
+
+    def compile_value(self) -> Expression:
+        if self.index >= len(self.args):
+            raise ArgumentError('Not enough arguments')
+        arg = self.args[self.index]
+        self.index += 1
+        if arg.token.type == TokenType.NUMBER:
+            value: int = arg.token.value
+            return lambda: value
+        return arg.to_numeric
+
+    def has_symbol(self, symbols: list[str]|None = None) -> bool:
+        """ Checks for a symbol (in the list if given) without using it. """
+        if self.index >= len(self.args):
+            return False
+        arg = self.args[self.index]
+        if not arg.is_valid_symbol():
+            return False
+        return symbols is None or arg.to_symbol() in symbols
+
+
+def make_operation(
+    operator: str,
+    left: Expression,
+    right: Expression) -> Expression:
+    """ Returns an expression that does one operation on two others. """
+    if operator == '+':
+        return lambda: left() + right()
+    elif operator == '-':
+        return lambda: left() - right()
+    elif operator == '*':
+        return lambda: left() * right()
+    elif operator == '/':
+        return lambda: left() // right()
+    else:
+        return lambda: left() % right()
@@ -145,8 +145,7 @@ class SFNDirectory:
 
         path = self.get_new_file_path(filename)
         with open(path, 'wb') as file:
-            data = self.memory.read_data(address, length)
-            file.write(data)
+            file.write(self.memory.view_data(address, length))
             
     def does_file_exist(self, filename: str) -> bool:
         """
@@ -0,0 +1,340 @@
+# This is the control flow graph of the MikeOS Basic Emulator.
+# It follows the jumps in a compiled program to check it before it runs.
+
+from bisect import bisect_right
+
+from compiler import (
+    CompiledProgram,
+    ProgramLine,
+    find_tail,
+    get_label,
+    get_read_labels,
+    get_variable,
+    get_word,
+)
+from keywords import all_keywords
+from memory import Memory
+from parser import Token, TokenType
+from variables import ForVariable
+
+
+class ControlFlowGraph:
+    """
+    The lines of a compiled program and where each one can go next.
+
+    `successors` maps the address of each line to the lines that can be
+    run after it: the next line and the targets of GOTO, IF blocks, LOOP
+    and NEXT. A GOSUB carries on at the next line, as that's where it
+    returns to, and its target is kept in `calls`.
+    `returns` has the RETURN lines and `exits` the lines that END or run
+    off the end of the program.
+    `labels` maps each label that's used to its line (or None if it's not
+    defined). Labels are found the way `get_label_pointer()` finds them.
+
+    It's made from what the compiler found, so nothing is parsed again and
+    each line is only looked at once.
+
+    Some jumps can't be followed ahead of time, e.g. GOTO PROGSTART or a
+    LOOP without a matching DO. They set `has_unknown_jumps`, and then no
+    code is reported as unreachable, as any line might be run.
+
+    Problems are described in `errors`, for what stops the program if it
+    gets there, and `warnings` for the rest (such as unreachable code).
+
+    The lines are split into basic blocks, runs of lines that are always
+    run one after the other. A block starts at each line in `leaders`
+    (the first line, lines that are jumped to and lines after a jump)
+    and ends at the next leader or at a line in `block_ends`, one that
+    jumps, calls, returns or ends the program.
+    """
+    def __init__(self, program: CompiledProgram, memory: Memory) -> None:
+        self.program = program
+        self.memory = memory
+        self.addresses = list(program.lines)
+        self.successors: dict[int, list[int]] = {}
+        self.calls: dict[int, int] = {}
+        self.returns: set[int] = set()
+        self.exits: set[int] = set()
+        self.labels: dict[str, int|None] = {}
+        self.has_unknown_jumps = False
+        self.leaders: set[int] = set()
+        self.block_ends: set[int] = set()
+        self.errors: list[str] = []
+        self.warnings: list[str] = []
+
+        for line in program.lines.values():
+            self.add_line(line)
+        self.reachable = self.find_reachable(self.addresses[:1], True)
+        self.check_subroutines()
+        if not self.has_unknown_jumps:
+            self.find_unreachable_code()
+        self.find_leaders()
+
+    def add_error(self, line: ProgramLine, message: str) -> None:
+        self.errors.append(f'Line {line.number}: {message}')
+
+    def add_warning(self, line: ProgramLine, message: str) -> None:
+        self.warnings.append(f'Line {line.number}: {message}')
+
+    def add_line(self, line: ProgramLine) -> None:
+        self.successors[line.address] = []
+        if not line.tokens or self.add_command(line, line.tokens, 0):
+            self.add_next_line(line)
+
+    def add_next_line(self, line: ProgramLine) -> None:
+        self.add_jump(line, line.next_address)
+
+    def add_jump(self, line: ProgramLine, target: int) -> None:
+        # Blocks can end with the program, so their target is past the end.
+        if target in self.program.lines:
+            self.successors[line.address].append(target)
+        else:
+            self.exits.add(line.address)
+
+    def add_command(self,
+        line: ProgramLine,
+        tokens: list[Token],
+        index: int) -> bool:
+        """
+        Adds where the command at the index can jump to.
+        Returns True if it can carry on to the next line.
+        """
+        word = get_word(tokens, index)
+        if word == 'GOTO':
+            target = self.find_target(line, tokens, index + 1)
+            if target is not None:
+                self.add_jump(line, target)
+            return False
+        elif word == 'GOSUB':
+            target = self.find_target(line, tokens, index + 1)
+            if target is not None:
+                self.calls[line.address] = target
+            return True
+        elif word == 'RETURN':
+            self.returns.add(line.address)
+            return False
+        elif word == 'END':
+            self.exits.add(line.address)
+            return False
+        elif word == 'LOOP':
+            return self.add_loop(line, tokens, index)
+        elif word == 'NEXT':
+            self.add_next(line, tokens, index)
+            return True
+        elif word == 'READ':
+            name = get_label(tokens, index + 1)
+            if name is not None and self.find_label(line, name) is None:
+                self.add_error(line, f'Undefined label: {name}')
+            return True
+        elif word in ('IF', 'ELSE'):
+            return self.add_conditional(line, tokens, index)
+        return True
+
+    def add_conditional(self,
+        line: ProgramLine,
+        tokens: list[Token],
+        index: int) -> bool:
+
+        tail = find_tail(tokens, index)
+        if tail == -1:
+            return True
+        if tail < len(tokens):
+            # The tail may not run, so the line can always carry on.
+            self.add_command(line, tokens, tail)
+            return True
+        # An IF block or the ELSE in one, if the compiler matched it.
+        if get_word(tokens, index) == 'IF':
+            target = self.program.if_targets.get(line.address)
+            if target is not None:
+                self.add_jump(line, target)
+            return True
+        target = self.program.else_targets.get(line.address)
+        if target is None:
+            return True
+        self.add_jump(line, target)
+        return False
+
+    def add_loop(self,
+        line: ProgramLine,
+        tokens: list[Token],
+        index: int) -> bool:
+
+        target = self.program.loop_targets.get(line.address)
+        if target is None:
+            # Left to the DO stack at run time.
+            self.has_unknown_jumps = True
+            return True
+        self.add_jump(line, target)
+        return get_word(tokens, index + 1) != 'ENDLESS'
+
+    def add_next(self,
+        line: ProgramLine,
+        tokens: list[Token],
+        index: int) -> None:
+
+        for_loop = self.program.next_loops.get(line.address)
+        if for_loop is None:
+            # A NEXT after THEN goes to the nearest FOR of its variable.
+            for_loop = self.find_for_loop(line, get_variable(tokens, index + 1))
+        if for_loop is None:
+            self.has_unknown_jumps = True
+        else:
+            self.add_jump(line, for_loop.loop_start_pos)
+
+    def find_for_loop(self,
+        line: ProgramLine,
+        variable: str|None) -> ForVariable|None:
+
+        # The loops are in the order they were matched, not by address.
+        nearest: tuple[int, ForVariable]|None = None
+        for address, for_loop in self.program.for_loops.items():
+            if (address < line.address and
+                for_loop.iterator_variable_name == variable and
+                (nearest is None or address > nearest[0])):
+                nearest = (address, for_loop)
+        return nearest[1] if nearest is not None else None
+
+    def find_target(self,
+        line: ProgramLine,
+        tokens: list[Token],
+        index: int) -> int|None:
+        """
+        Returns the line a GOTO or GOSUB goes to, or None if it's not known.
+        """
+        name = get_label(tokens, index)
+        if name is None:
+            # A syntax error, which the interpreter reports.
+            return None
+        if tokens[index].type == TokenType.WORD and name in all_keywords:
+            self.has_unknown_jumps = True
+            return None
+        target = self.find_label(line, name)
+        if target is None:
+            self.add_error(line, f'Undefined label: {name}')
+        return target
+
+    def find_label(self, line: ProgramLine, name: str) -> int|None:
+        """
+        Returns the line the label is on, searching the program text for
+        the first `name:` like the interpreter does.
+        """
+        if name in self.labels:
+            return self.labels[name]
+        start = self.program.start
+        address = self.memory.data.find(
+            f'{name}:'.encode('cp437', 'replace'),
+            start, start + self.program.size)
+        target: int|None = None
+        if address != -1:
+            target = self.addresses[bisect_right(self.addresses, address) - 1]
+            # An indented label is still the label of its own line.
+            indent = self.memory.data[target:address]
+            if indent.strip(b' \t'):
+                # It's in the middle of a line (e.g. in `gone:` for `one`),
+                # which runs as a label, then on to the next line.
+                found_in = self.program.lines[target]
+                self.add_warning(line, f'Label {name} is found inside '
+                    f'line {found_in.number}')
+                target = found_in.next_address
+                if target not in self.program.lines:
+                    target = None
+        self.labels[name] = target
+        return target
+
+    def find_reachable(self, starts: list[int], follow_calls: bool) -> set[int]:
+        """ Returns every line that can be run after the starting lines. """
+        reached = set(starts)
+        to_visit = list(starts)
+        while to_visit:
+            address = to_visit.pop()
+            targets = self.successors[address]
+            if follow_calls and address in self.calls:
+                targets = targets + [self.calls[address]]
+            for target in targets:
+                if target not in reached:
+                    reached.add(target)
+                    to_visit.append(target)
+        return reached
+
+    def check_subroutines(self) -> None:
+        # Lines run from the start without a GOSUB have nothing to return to,
+        # e.g. when a program runs on into its subroutines.
+        main = self.find_reachable(self.addresses[:1], False)
+        for address in sorted(self.returns & main):
+            self.add_error(self.program.lines[address], 'RETURN without GOSUB')
+
+        # A subroutine that jumps away without returning leaves its return
+        # address on the stack each time, until it overflows.
+        if self.has_unknown_jumps:
+            return
+        ends = self.returns | self.exits
+        for target in sorted(set(self.calls.values())):
+            if not self.find_reachable([target], False) & ends:
+                self.add_error(self.program.lines[target],
+                    'Subroutine never reaches RETURN')
+
+    def find_leaders(self) -> None:
+        self.leaders = set(self.addresses[:1]) | set(self.calls.values())
+        for line in self.program.lines.values():
+            successors = self.successors[line.address]
+            if successors == [line.next_address] and \
+                line.address not in self.calls:
+                continue
+            self.block_ends.add(line.address)
+            self.leaders.update(successors)
+            if line.next_address in self.program.lines:
+                self.leaders.add(line.next_address)
+
+    def get_block(self, address: int) -> list[ProgramLine]:
+        """
+        Returns the lines from the address to the end of its basic block.
+        The address doesn't have to be a leader, e.g. after GOTO PROGSTART.
+        """
+        block: list[ProgramLine] = []
+        line = self.program.lines.get(address)
+        while line is not None:
+            block.append(line)
+            if (line.address in self.block_ends or
+                line.next_address in self.leaders):
+                break
+            line = self.program.lines.get(line.next_address)
+        return block
+
+    def find_unreachable_code(self) -> None:
+        data_labels = get_read_labels(self.program)
+        first: ProgramLine|None = None
+        last: ProgramLine|None = None
+        previous: ProgramLine|None = None
+        for line in self.program.lines.values():
+            if line.address in self.reachable:
+                self.add_unreachable(first, last)
+                first = last = None
+            elif (is_code(line) and not
+                (previous is not None and is_data_label(previous, data_labels))):
+                first = first or line
+                last = line
+            previous = line
+        self.add_unreachable(first, last)
+
+    def add_unreachable(self,
+        first: ProgramLine|None,
+        last: ProgramLine|None) -> None:
+
+        if first is None or last is None:
+            return
+        if first is last:
+            self.add_warning(first, 'Unreachable code')
+        else:
+            self.warnings.append(
+                f'Lines {first.number}-{last.number}: Unreachable code')
+
+
+def is_code(line: ProgramLine) -> bool:
+    """ Checks if a line has a command, not just a label or comment. """
+    return bool(line.tokens) and line.tokens[0].type not in (
+        TokenType.COMMENT, TokenType.LABEL)
+
+def is_data_label(line: ProgramLine, data_labels: set[str]) -> bool:
+    """ Checks if a line is a label for READ, so the next line is data. """
+    return (line.tokens is not None and len(line.tokens) == 1 and
+        get_label(line.tokens, 0) in data_labels)
@@ -0,0 +1,184 @@
+# This is the fork server for the MikeOS Basic Emulator.
+# It pays the start-up costs once, then forks a ready worker for each run.
+
+import logging
+import os
+import struct
+import subprocess
+import sys
+import time
+
+# Importing these does most of the start-up work:
+# - constants parses config.toml.
+# - environment pulls in pygame, numpy and sounddevice.
+# - runcmd imports every instruction module.
+import pygame
+
+from constants import DEFAULT_CHARACTER_HEIGHT
+from environment import Environment
+from backend.pygame.display import load_font
+from runcmd import CommandQueue
+from mikeos_basic_emulator import (
+    display_preamble,
+    load_program,
+    run_display_loop,
+    setup_interpreter,
+)
+
+log = logging.getLogger(__name__)
+
+# Used to time a start-up without the fork server.
+COLD_START_SCRIPT = '''
+from forkserver import start_environment, stop_environment
+env, cmdqueue = start_environment()
+print('ready', flush=True)
+stop_environment(env, cmdqueue)
+'''
+
+def start_environment() -> tuple[Environment, CommandQueue]:
+    """
+    Creates an environment with a running interpreter.
+
+    This is the point at which a program could be loaded.
+    """
+    env = Environment()
+    cmdqueue = setup_interpreter(env)
+    return env, cmdqueue
+
+def stop_environment(env: Environment, cmdqueue: CommandQueue) -> None:
+    """ Stops the interpreter thread and closes the display. """
+    cmdqueue.put('/EXIT')
+    while not env.display.has_exited():
+        time.sleep(0.001)
+
+
+class ForkServer:
+    """
+    Keeps a prewarmed process that forks a fresh emulator for each run.
+
+    Start-up normally pays for pygame, the BDF font, the TOML config,
+    the instruction modules and the numpy/sounddevice imports.
+    Those are done once by `prewarm()` and inherited by every worker.
+
+    Only the font subsystem is initialised before forking.
+    The video and audio subsystems are started by each worker, as they
+    hold connections that cannot be shared between processes.
+
+    The latency of each run (from the request until the interpreter is
+    ready to load a program) is recorded in `startup_times`.
+
+    This depends on `os.fork()` so it is only available on POSIX systems.
+    """
+    def __init__(self) -> None:
+        if not hasattr(os, 'fork'):
+            raise OSError('The fork server requires os.fork().')
+        self.prewarmed = False
+        self.startup_times: list[float] = []
+
+    def prewarm(self) -> None:
+        """ Loads everything that can be shared with the workers. """
+        pygame.font.init()
+        load_font(DEFAULT_CHARACTER_HEIGHT)
+        self.prewarmed = True
+
+    def run(self, program: str) -> int:
+        """
+        Forks a worker to run a program and waits for it to finish.
+
+        Returns the exit status of the worker.
+        """
+        return self.fork_worker(program)
+
+    def measure_startup(self) -> float:
+        """
+        Forks a worker that exits as soon as it is ready.
+
+        Returns the start-up latency in seconds.
+        """
+        self.fork_worker(None)
+        return self.startup_times[-1]
+
+    def fork_worker(self, program: str|None) -> int:
+        if not self.prewarmed:
+            self.prewarm()
+        read_fd, write_fd = os.pipe()
+        requested = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            status = 0
+            try:
+                self.run_worker(program, requested, write_fd)
+            except BaseException:
+                log.exception('Worker failed.')
+                status = 1
+            finally:
+                os._exit(status)
+
+        os.close(write_fd)
+        with os.fdopen(read_fd, 'rb') as pipe:
+            report = pipe.read(struct.calcsize('d'))
+        _, status = os.waitpid(pid, 0)
+        if len(report) == struct.calcsize('d'):
+            latency, = struct.unpack('d', report)
+            self.startup_times.append(latency)
+            log.info(f'Worker {pid} ready in {latency * 1000:.1f} ms')
+        return os.waitstatus_to_exitcode(status)
+
+    def run_worker(self,
+        program: str|None,
+        requested: float,
+        report_fd: int) -> None:
+        """ Runs inside the forked process. """
+        env, cmdqueue = start_environment()
+        latency = time.perf_counter() - requested
+        os.write(report_fd, struct.pack('d', latency))
+        os.close(report_fd)
+
+        if program is None:
+            stop_environment(env, cmdqueue)
+            return
+        display_preamble(env)
+        load_program(cmdqueue, program)
+        run_display_loop(env)
+
+
+def measure_cold_startup() -> float:
+    """
+    Starts a new Python process and times it until the interpreter is ready.
+
+    This is the cost paid by every run without the fork server.
+    """
+    path = os.pathsep.join([os.path.dirname(__file__)] + sys.path)
+    requested = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-c', COLD_START_SCRIPT],
+        stdout=subprocess.PIPE,
+        env=dict(os.environ, PYTHONPATH=path),
+    )
+    assert process.stdout is not None
+    process.stdout.readline()
+    latency = time.perf_counter() - requested
+    process.wait()
+    return latency
+
+def main() -> None:
+    """
+    Runs each program named on the command line in a forked worker.
+
+    With no programs, the start-up latency is compared instead.
+    """
+    logging.basicConfig(level=logging.INFO)
+    server = ForkServer()
+    programs = sys.argv[1:]
+    if len(programs) == 0:
+        cold = measure_cold_startup()
+        warm = server.measure_startup()
+        print(f'Start-up without fork server: {cold * 1000:.1f} ms')
+        print(f'Start-up with fork server: {warm * 1000:.1f} ms')
+        return
+    for program in programs:
+        server.run(program)
+
+if __name__ == '__main__':
+    main()
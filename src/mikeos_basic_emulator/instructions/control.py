@@ -1,6 +1,6 @@
 from arglist import CommandArgumentList
 from environment import Environment
-from constants import DEFAULT_LOAD_POINT
+from constants import DEFAULT_LOAD_POINT, STRICT_COMPATIBILITY
 from variables import ForVariable
 
 def cmd_break(args: CommandArgumentList, env: Environment) -> None:
@@ -11,17 +11,31 @@ def cmd_call(args: CommandArgumentList, env: Environment) -> None:
     env.debugger.breakpoint(env)
 
 def cmd_do(args: CommandArgumentList, env: Environment) -> None:
-    env.do_stack.append(env.next_line_address)
+    # A DO matched by the compiler doesn't need its address kept.
+    if env.program_counter not in env.get_program().do_lines:
+        env.do_stack.append(env.next_line_address)
     
 def cmd_else(args: CommandArgumentList, env: Environment) -> None:
-    # If the previous IF was not true, run the rest of the line next.
+    # An ELSE on its own is reached at the end of the true part of an IF
+    # block, so the ELSE part is jumped over.
+    if not args.has_any():
+        target = env.get_program().else_targets.get(env.program_counter)
+        if target is not None:
+            env.next_line_address = target
+        return
+
+    # If the previous IF was not true, run the rest of the line now.
     # Otherwise it is skipped.
     if not env.last_if_true:
-        env.next_command = args.make_new_arglist_from_remaining()
+        env.get_command_runner().run_command(args)
 
 def cmd_end(args: CommandArgumentList, env: Environment) -> None:
     env.debugger.on_program_exit(env)
 
+def cmd_endif(args: CommandArgumentList, env: Environment) -> None:
+    # Only marks the end of an IF block for the compiler.
+    pass
+
 def cmd_for(args: CommandArgumentList, env: Environment) -> None:
     iteration_variable = args.get_numeric_variable()
     args.get_specific_symbol('=')
@@ -29,9 +43,12 @@ def cmd_for(args: CommandArgumentList, env: Environment) -> None:
     args.get_specific_word('TO')
     end_value = args.do_numeric_sum()
 
-    forvar = ForVariable(iteration_variable, env.variables)
+    # The compiler makes one for each FOR it could match with a NEXT.
+    forvar = env.get_program().for_loops.get(env.program_counter)
+    if forvar is None or forvar.iterator_variable_name != iteration_variable:
+        forvar = ForVariable(iteration_variable, env.variables)
+        forvar.set_loop_start_position(env.next_line_address)
     forvar.set_range(start_value, end_value)
-    forvar.set_loop_start_position(env.next_line_address)
     env.for_variables[iteration_variable] = forvar
 
 def cmd_goto(args: CommandArgumentList, env: Environment) -> None:
@@ -39,13 +56,26 @@ def cmd_goto(args: CommandArgumentList, env: Environment) -> None:
     env.next_line_address = new_position
     
 def cmd_gosub(args: CommandArgumentList, env: Environment) -> None:
-    # Return to the address after the GOSUB command
-    next_line = env.memory.find_next_line(env.program_counter)
-    # Push the return address onto the stack
-    env.gosub_stack.append(next_line)
-    
     # Find the new position from the next argument.
     new_position = args.get_program_pointer()
+
+    if env.gosub_stack.is_full():
+        args.reuse()
+        label = str(args.get_token().value).rstrip(':')
+        env.debugger.error('COMMAND', f'Stack overflow at label {label}.')
+        env.debugger.breakpoint(env)
+        return
+
+    # Return to the address after the GOSUB command, which the compiler
+    # has already found for lines in the program.
+    line = env.get_program().lines.get(env.program_counter)
+    if line is not None:
+        next_line = line.next_address
+    else:
+        next_line = env.memory.find_next_line(env.program_counter)
+    # Push the return address onto the stack
+    env.gosub_stack.push(next_line)
+    
     # Now set it as the next line to run.
     env.next_line_address = new_position
 
@@ -56,12 +86,20 @@ def cmd_if(args: CommandArgumentList, env: Environment) -> None:
     env.last_if_true = result
     
     args.get_specific_word('THEN')
+
+    # With nothing after THEN it's an IF block. If it's false, jump to the
+    # ELSE part or past the ENDIF, as found by the compiler.
+    if not args.has_any():
+        if not result:
+            target = env.get_program().if_targets.get(env.program_counter)
+            if target is not None:
+                env.next_line_address = target
+        return
     
-    # If true then make a new command from the remaining arguments.
-    # Otherwise ignore the remaining arguments.
+    # If true then run the remaining arguments as a command, carrying on
+    # from this argument list. Otherwise ignore the remaining arguments.
     if result == True:
-        new_command = args.make_new_arglist_from_remaining()
-        env.next_command = new_command
+        env.get_command_runner().run_command(args)
     
 def cmd_include(args: CommandArgumentList, env: Environment) -> None:
     filename = args.get_string()
@@ -87,7 +125,9 @@ def cmd_loop(args: CommandArgumentList, env: Environment) -> None:
     else:
         continue_loop = True
 
-    loop_start = env.do_stack.pop()
+    loop_start = env.get_program().loop_targets.get(env.program_counter)
+    if loop_start is None:
+        loop_start = env.do_stack.pop()
     if continue_loop:
         env.next_line_address = loop_start
 
@@ -98,11 +138,10 @@ def cmd_next(args: CommandArgumentList, env: Environment) -> None:
         env.debugger.breakpoint(env)
     else:
         for_var = env.for_variables[for_variable]
-        for_var.increment()
-        if for_var.is_finished():
-            del env.for_variables[for_variable]
+        if for_var.advance():
+            env.next_line_address = for_var.loop_start_pos
         else:
-            env.next_line_address = for_var.get_loop_start_position()
+            del env.for_variables[for_variable]
             
 def cmd_pause(args: CommandArgumentList, env: Environment) -> None:
     seconds = args.get_numeric() / 10
@@ -132,4 +171,12 @@ all_commands = {
     'NEXT': cmd_next,
     'PAUSE': cmd_pause,
     'RETURN': cmd_return,
-}
\ No newline at end of file
+}
+
+# IF blocks aren't in MikeOS, so ENDIF is an extension.
+extension_commands = {
+    'ENDIF': cmd_endif,
+}
+
+if not STRICT_COMPATIBILITY:
+    all_commands.update(extension_commands)
@@ -1,8 +1,10 @@
 # This file contains the data commands for the MikeOS BASIC emulator.
 
+from array import array
 import random
 
 from arglist import CommandArgumentList
+from constants import STRICT_COMPATIBILITY
 from environment import Environment
 
 def cmd_peek(args: CommandArgumentList, env: Environment) -> None:
@@ -27,6 +29,33 @@ def cmd_pokeint(args: CommandArgumentList, env: Environment) -> None:
     address = args.get_numeric()
     env.memory.write_word(address, value)
 
+def cmd_memcompare(args: CommandArgumentList, env: Environment) -> None:
+    """
+    MEMCOMPARE <variable> <first> <second> <length>
+    Sets the variable to 0 if the blocks match, otherwise to the position
+    of the first byte that differs plus one.
+    """
+    outvar = args.get_numeric_variable()
+    first = args.get_numeric()
+    second = args.get_numeric()
+    length = args.get_numeric()
+    offset = env.memory.compare_data(first, second, length)
+    env.variables.set_numeric_variable(outvar, offset + 1)
+
+def cmd_memcopy(args: CommandArgumentList, env: Environment) -> None:
+    """ MEMCOPY <source> <destination> <length> """
+    source = args.get_numeric()
+    destination = args.get_numeric()
+    length = args.get_numeric()
+    env.memory.copy_data(source, destination, length)
+
+def cmd_memfill(args: CommandArgumentList, env: Environment) -> None:
+    """ MEMFILL <value> <address> <length> (in the same order as POKE) """
+    value = args.get_numeric()
+    address = args.get_numeric()
+    length = args.get_numeric()
+    env.memory.fill_data(address, value, length)
+
 def cmd_rand(args: CommandArgumentList, env: Environment) -> None:
     outvar = args.get_numeric_variable()
     minimum = args.get_numeric()
@@ -35,25 +64,34 @@ def cmd_rand(args: CommandArgumentList, env: Environment) -> None:
     env.variables.set_numeric_variable(outvar, value)
     
 def cmd_read(args: CommandArgumentList, env: Environment) -> None:
-    block_name, start_position = args.get_label_and_pointer()
+    """
+    READ <label> <index> <variable>
+    Sets the variable to a number from the line after the label.
+    """
+    # The compiler has already read most blocks.
+    program = env.get_program()
+    block_name = str(args.get_token().value).rstrip(':')
+    data = program.data_blocks.get(block_name)
 
-    if block_name not in env.read_blocks.keys():
+    if data is None:
+        args.reuse()
+        _, start_position = args.get_label_and_pointer()
         interpreter = env.get_command_runner()
         start_position = env.memory.find_next_line(start_position)
         raw_data = env.memory.read_line(start_position)
         data_args = interpreter.decode_arguments(raw_data)
         
-        data: list[int] = []
+        data = array('H')
         while data_args.has_numeric():
-            data.append(data_args.get_numeric())
-        env.read_blocks[block_name] = data
-    else:
-        data = env.read_blocks[block_name]
+            data.append(data_args.get_numeric() & 0xFFFF)
+        program.data_blocks[block_name] = data
             
     position = args.get_numeric()
 
     if position >= len(data):
-        raise ValueError('End of data block reached')
+        env.debugger.error('COMMAND', f'READ past the end of data block '
+            f'{block_name}: index {position}, but it has {len(data)} values.')
+        env.debugger.breakpoint(env)
     else:
         args.set_numeric_variable(data[position])
     
@@ -66,3 +104,13 @@ all_commands = {
     'RAND': cmd_rand,
     'READ': cmd_read,
 }
+
+# These aren't in MikeOS, they replace PEEK/POKE loops over whole blocks.
+extension_commands = {
+    'MEMCOMPARE': cmd_memcompare,
+    'MEMCOPY': cmd_memcopy,
+    'MEMFILL': cmd_memfill,
+}
+
+if not STRICT_COMPATIBILITY:
+    all_commands.update(extension_commands)
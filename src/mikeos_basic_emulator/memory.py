@@ -1,7 +1,43 @@
 # This is the memory module of the MikeOS Basic Emulator.
 # It is responsible for emulating the 64k memory of the emulated machine.
 
-# TODO: Add address validation to the read and write methods.
+import codecs
+import mmap
+from pathlib import Path
+import sys
+from typing import Callable, NamedTuple
+
+WriteCallback = Callable[[int, int], None]
+
+MEMORY_SIZE = 65536
+
+# Addresses wrap around at 64 kiB, like offsets in a real mode segment.
+ADDRESS_MASK = MEMORY_SIZE - 1
+
+# Watchpoints are filtered by page, one bit per page in `watched_pages`.
+PAGE_SHIFT = 8
+
+# Looked up once, as str() and bytes.decode() find the codec on every call.
+decode_cp437 = codecs.getdecoder('cp437')
+
+# mmap.find() only takes bytes, so terminators are looked up here.
+SINGLE_BYTES = tuple(bytes((n,)) for n in range(256))
+
+class WriteListener(NamedTuple):
+    """ A callback for writes that overlap the range start to end - 1. """
+    start: int
+    end: int
+    callback: WriteCallback
+
+class Watchpoint(NamedTuple):
+    """ Traps reads and/or writes to the addresses start to end - 1. """
+    start: int
+    end: int
+    on_read: bool
+    on_write: bool
+
+# Called with the watchpoint, address, length and True for a write.
+WatchHandler = Callable[[Watchpoint, int, int, bool], None]
 
 class Memory:
     """
@@ -11,6 +47,11 @@ class Memory:
      - read_x(address: int) -> type
      - write_x(address: int, value: type) -> None
     
+    Addresses are 16-bit and wrap around, as they do in a real mode segment.
+    Each method masks its address once, so any integer is a valid address,
+    and reads or writes that run past 0xFFFF continue at 0x0000.
+    Constant addresses are already checked by the parser.
+
     Current types are:
      - byte (8 bits)
      - word (16 bits)
@@ -18,10 +59,49 @@ class Memory:
      - line (cp437 encoded, newline terminated)
      - data (fixed length byte array)
 
+    There are also view_x(address: int) -> memoryview methods.
+    These return a window onto the live memory without copying it.
+    (Unless the block wraps around, then it's a view of a copy.)
+    A view changes if the memory is written to, so copy it if it's kept.
+
+    Write listeners can be added to be told about writes to a range.
+    They are called with the address and length of any write that overlaps
+    it, after the write is done. Writes through a view aren't reported,
+    and neither are writes by other processes to a shared memory.
+
+    Memory is normally a private bytearray. If a backing file is given it's
+    a shared mmap of that file instead, so other processes (a hex viewer,
+    a test harness) can watch and poke the live memory by mapping it too.
+    The file is cleared to 64 kiB of zeroes when the memory is created.
+
+    Watchpoints trap reads or writes to an address range by calling the
+    `watch_handler`, after the access is done.
+    Each page of memory has a bit in `watched_pages`, which is set if any
+    watchpoint covers it, so accesses to unwatched pages cost one bit test.
+    Accesses through a view aren't trapped.
     
     """
-    def __init__(self) -> None:
-        self.data = bytearray(65536)
+    # Set by subclasses that need every access to go through these methods.
+    counts_accesses = False
+
+    def __init__(self, backing_file: str|Path|None = None) -> None:
+        self.data: bytearray|mmap.mmap
+        self.backing_file = backing_file
+        # Other processes can write to a file backed memory without us
+        # knowing, so nothing should be cached on the strength of listeners.
+        self.is_shared = bool(backing_file)
+        if backing_file:
+            with open(backing_file, 'w+b') as file:
+                file.truncate(MEMORY_SIZE)
+                self.data = mmap.mmap(file.fileno(), MEMORY_SIZE)
+        else:
+            self.data = bytearray(MEMORY_SIZE)
+        # Memory never changes size, so one view can be shared by all reads.
+        self.view = memoryview(self.data)
+        self.write_listeners: list[WriteListener] = []
+        self.watchpoints: list[Watchpoint] = []
+        self.watched_pages = 0
+        self.watch_handler: WatchHandler|None = None
 
     def read_byte(self, address: int) -> int:
         """
@@ -29,6 +109,9 @@ class Memory:
 
         The values is returned as and unsigned integer between 0 and 255.
         """
+        address &= ADDRESS_MASK
+        if self.watched_pages >> (address >> PAGE_SHIFT) & 1:
+            self.check_watchpoints(address, 1, False)
         return self.data[address]
 
     def read_word(self, address: int) -> int:
@@ -37,7 +120,11 @@ class Memory:
 
         The value is returned as an unsigned integer between 0 and 65535.
         """
-        return self.data[address] + (self.data[address + 1] << 8)
+        address &= ADDRESS_MASK
+        high = (address + 1) & ADDRESS_MASK
+        if self.watched_pages and self.is_word_watched(address, high):
+            self.check_watchpoints(address, 2, False)
+        return self.data[address] + (self.data[high] << 8)
 
     def write_byte(self, address: int, value: int) -> None:
         """
@@ -45,7 +132,12 @@ class Memory:
         The value must be an unsigned integer between 0 and 255.
         Out of range values will be truncated to 8 bits.
         """
+        address &= ADDRESS_MASK
         self.data[address] = value & 0xff
+        if self.write_listeners:
+            self.notify_write(address, 1)
+        if self.watched_pages >> (address >> PAGE_SHIFT) & 1:
+            self.check_watchpoints(address, 1, True)
 
     def write_word(self, address: int, value: int) -> None:
         """
@@ -53,8 +145,14 @@ class Memory:
         The value must be an unsigned integer between 0 and 65535.
         Out of range values will be truncated to 16 bits.
         """
+        address &= ADDRESS_MASK
+        high = (address + 1) & ADDRESS_MASK
         self.data[address] = value & 0xff
-        self.data[address + 1] = (value >> 8) & 0xff
+        self.data[high] = (value >> 8) & 0xff
+        if self.write_listeners:
+            self.notify_write(address, 2)
+        if self.watched_pages and self.is_word_watched(address, high):
+            self.check_watchpoints(address, 2, True)
 
     def read_string(self, 
         address: int, 
@@ -74,14 +172,47 @@ class Memory:
         The string is decoded from cp437 encoding (the BIOS codepage).
         """
 
-        encoded = self.data[address:address + limit]
-        # Check for null terminator.
-        # If present before the limit, use it's position as the length.
-        if terminator in encoded:
-            length = encoded.index(terminator)
+        address &= ADDRESS_MASK
+        # Most strings end before the top of memory, so look for that first.
+        end = self.data.find(SINGLE_BYTES[terminator],
+            address, address + limit)
+        if end != -1:
+            view = self.view[address:end]
         else:
-            length = limit
-        return encoded[:length].decode('cp437', 'replace')
+            view = self.get_string_block(address, limit, terminator)
+        if self.watched_pages:
+            self.check_watchpoints(address, max(len(view), 1), False)
+        return decode_cp437(view, 'replace')[0]
+
+    def view_string(self,
+        address: int,
+        limit: int = 127,
+        terminator: int = 0) -> memoryview:
+        """
+        Returns a view of a terminated string in memory, without copying it.
+
+        The terminator is found with a single search of the live memory.
+        If it isn't found before the limit, the view is `limit` bytes long.
+        The terminator is not included.
+        """
+        return self.get_string_block(address, limit, terminator)
+
+    def get_string_block(self,
+        address: int,
+        limit: int,
+        terminator: int) -> memoryview:
+
+        address &= ADDRESS_MASK
+        end = self.data.find(SINGLE_BYTES[terminator],
+            address, address + limit)
+        if end != -1:
+            return self.view[address:end]
+        if address + limit <= MEMORY_SIZE:
+            return self.view[address:address + limit]
+        # The string carries on at the bottom of memory.
+        block = self.data[address:] + self.data[:address + limit - MEMORY_SIZE]
+        end = block.find(SINGLE_BYTES[terminator])
+        return memoryview(block)[:len(block) if end == -1 else end]
 
     def write_string(self, 
         address: int, 
@@ -100,11 +231,11 @@ class Memory:
         MikeOS string by default.
         """
 
-        encoded = string.encode('cp437', 'replace')[:limit]
-        self.data[address:address + len(encoded)] = encoded
+        self.put_block(address, string.encode('cp437', 'replace')[:limit])
 
     def dump(self, address: int, length: int) -> None:
         for i in range(address, address + length):
+            i &= ADDRESS_MASK
             print(f'{i:04x}: {self.data[i]:02x}')
             
             
@@ -120,16 +251,20 @@ class Memory:
         """
         return self.read_string(address, 255, terminator=0x0A)
     
-    def find_next_line(self, address: int) -> int:
+    def find_next_line(self, address: int, limit: int = MEMORY_SIZE) -> int:
         """
         Returns the address of the next line in memory.
 
         Search starts at the given address and continues until the first
-        newline character is found.
+        newline character is found, up to (but not including) the limit.
+        The search wraps past 0xFFFF if the limit is below the address.
         
         A ValueError is raised if no newline character is found.
         """
-        return self.data.index(0x0A, address) + 1
+        index = self.find_bytes(b'\n', address, limit)
+        if index == -1:
+            raise ValueError('No newline found.')
+        return (index + 1) & ADDRESS_MASK
 
     def find_string(self, 
         string: str, 
@@ -139,27 +274,67 @@ class Memory:
         """
         Returns the first occurrence of the given string in memory between the
         start and limit addresses.
+        The search wraps past 0xFFFF if the limit is below the start.
         
         A ValueError is raised if the string is not found.
         """
         
         encoded = string.encode('cp437', 'replace')
-        index = self.data.find(encoded, start, limit)
+        index = self.find_bytes(encoded, start, limit)
         if index == -1:
             raise ValueError(f'String not found: {string}')
         return index
-    
 
+    def find_bytes(self, data: bytes, start: int, limit: int) -> int:
+        """
+        Returns the address of the first copy of the bytes from the start
+        address up to the limit, or -1 if there isn't one.
+
+        Both addresses are masked. If the limit is at or below the start the
+        search runs to the end of memory and carries on from 0x0000, so a
+        limit equal to the start searches the whole memory.
+        """
+        start &= ADDRESS_MASK
+        limit &= ADDRESS_MASK
+        if start < limit:
+            return self.data.find(data, start, limit)
+        if limit == 0:
+            return self.data.find(data, start)
+        # Join the two parts, so a match can run across the end of memory.
+        index = (self.data[start:] + self.data[:limit]).find(data)
+        if index == -1:
+            return -1
+        return (start + index) & ADDRESS_MASK
+    
     def read_data(self, address: int, length: int) -> bytearray:
         """
         Reads a fixed length block of data from memory.
 
         Returns a bytearray of the data.
-        
-        This may be less than the requested length if the end of memory is
-        reached.
         """
-        return self.data[address:address + length]
+        return bytearray(self.get_block(address, length))
+
+    def view_data(self, address: int, length: int) -> memoryview:
+        """
+        Returns a view of a fixed length block of memory, without copying it.
+        """
+        return self.get_block(address, length)
+    
+    def view_words(self, address: int, count: int) -> memoryview|None:
+        """
+        Returns a view of `count` consecutive 16-bit words, without copying.
+
+        Each element of the view reads and writes a whole word, the same
+        as read_word() and write_word().
+
+        Returns None if the host isn't little-endian (words in memory always
+        are) or if the block wraps around the end of memory, as a view
+        can't wrap.
+        """
+        address &= ADDRESS_MASK
+        if sys.byteorder != 'little' or address + count * 2 > len(self.data):
+            return None
+        return self.view[address:address + count * 2].cast('H')
     
     def write_data(self, address: int, data: bytes|bytearray) -> None:
         """
@@ -167,9 +342,193 @@ class Memory:
 
         The data must be a bytes or bytearray object.
 
-        The data will be truncated if it is longer than the available memory.
+        Only the last 64 kiB is kept if it's longer than memory.
         """
+        self.put_block(address, data)
 
-        if type(data) == bytes:
-            data = bytearray(data)
-        self.data[address:address + len(data)] = data
\ No newline at end of file
+    def get_block(self, address: int, length: int) -> memoryview:
+        """
+        Returns a view of a block of memory, checking read watchpoints.
+
+        If the block wraps around the end of memory the two parts are joined
+        in a copy, otherwise it's a view of the live memory.
+        """
+        address &= ADDRESS_MASK
+        length = max(0, min(length, MEMORY_SIZE))
+        if self.watched_pages:
+            self.check_watchpoints(address, length, False)
+        end = address + length
+        if end <= MEMORY_SIZE:
+            return self.view[address:end]
+        return memoryview(self.data[address:] + self.data[:end - MEMORY_SIZE])
+
+    def put_block(self, address: int, data: bytes|bytearray) -> None:
+        """
+        Writes a block of memory, wrapping around the end if needed.
+
+        Write listeners and watchpoints are told about it.
+        """
+        address &= ADDRESS_MASK
+        if len(data) > MEMORY_SIZE:
+            # Only the last time around would be left.
+            address = (address + len(data)) & ADDRESS_MASK
+            data = data[-MEMORY_SIZE:]
+        first = min(len(data), MEMORY_SIZE - address)
+        self.view[address:address + first] = data[:first]
+        if first < len(data):
+            self.view[:len(data) - first] = data[first:]
+        if self.write_listeners:
+            self.notify_write(address, len(data))
+        if self.watched_pages:
+            self.check_watchpoints(address, len(data), True)
+
+    def copy_data(self, source: int, destination: int, length: int) -> None:
+        """
+        Copies a block of memory to another address in one slice operation.
+
+        The blocks may overlap.
+        """
+        # The source is copied out first, so overlapping blocks are safe.
+        self.put_block(destination, bytes(self.get_block(source, length)))
+
+    def fill_data(self, address: int, value: int, length: int) -> None:
+        """ Sets a block of memory to one byte value in one operation. """
+        length = max(0, min(length, MEMORY_SIZE))
+        self.put_block(address, SINGLE_BYTES[value & 0xff] * length)
+
+    def compare_data(self, first: int, second: int, length: int) -> int:
+        """
+        Compares two blocks of memory.
+
+        Returns -1 if they're the same, or the offset of the first byte
+        that differs.
+        """
+        block = self.get_block(first, length)
+        other = self.get_block(second, length)
+        if block == other:
+            return -1
+        for offset in range(len(block)):
+            if block[offset] != other[offset]:
+                return offset
+        return -1
+
+    def get_image(self) -> bytes:
+        """
+        Returns a copy of the whole of memory, e.g. for a snapshot.
+
+        This isn't trapped by watchpoints or counted as a read.
+        """
+        return bytes(self.data)
+
+    def restore(self, image: bytes) -> None:
+        """
+        Replaces the whole of memory with an image from `get_image()`.
+
+        Write listeners are told, but watchpoints aren't triggered.
+        """
+        self.view[:] = image
+        if self.write_listeners:
+            self.notify_write(0, len(image))
+
+    def flush(self) -> None:
+        """ Writes a file backed memory out to its file. """
+        if isinstance(self.data, mmap.mmap):
+            self.data.flush()
+
+    def add_write_listener(self,
+        start: int,
+        end: int,
+        callback: WriteCallback) -> WriteListener:
+        """
+        Calls `callback(address, length)` after any write that overlaps the
+        addresses from start up to (but not including) end.
+        Returns the new listener.
+        """
+        listener = WriteListener(start, end, callback)
+        self.write_listeners.append(listener)
+        return listener
+
+    def remove_write_listener(self, listener: WriteListener) -> None:
+        self.write_listeners.remove(listener)
+
+    def notify_write(self, address: int, length: int) -> None:
+        end = address + length
+        if end > MEMORY_SIZE:
+            self.notify_write(address, MEMORY_SIZE - address)
+            self.notify_write(0, end - MEMORY_SIZE)
+            return
+        for listener in self.write_listeners:
+            if address < listener.end and end > listener.start:
+                listener.callback(address, length)
+
+    def add_watchpoint(self,
+        start: int,
+        end: int,
+        on_read: bool = False,
+        on_write: bool = True) -> Watchpoint:
+        """
+        Traps reads and/or writes to the addresses from start up to (but not
+        including) end. Returns the new watchpoint.
+        """
+        watchpoint = Watchpoint(start, end, on_read, on_write)
+        self.watchpoints.append(watchpoint)
+        self.update_watched_pages()
+        return watchpoint
+
+    def remove_watchpoint(self, watchpoint: Watchpoint) -> None:
+        self.watchpoints.remove(watchpoint)
+        self.update_watched_pages()
+
+    def update_watched_pages(self) -> None:
+        self.watched_pages = 0
+        for watchpoint in self.watchpoints:
+            self.watched_pages |= self.get_page_mask(
+                watchpoint.start, watchpoint.end - watchpoint.start)
+
+    def is_word_watched(self, low: int, high: int) -> bool:
+        """
+        Checks the pages of both bytes of a word, which may be different
+        pages (or the last and the first, at 0xFFFF).
+        """
+        return bool((self.watched_pages >> (low >> PAGE_SHIFT) |
+            self.watched_pages >> (high >> PAGE_SHIFT)) & 1)
+
+    def get_page_mask(self, address: int, length: int) -> int:
+        """ Returns the `watched_pages` bits for an address range. """
+        if length <= 0:
+            return 0
+        first = address >> PAGE_SHIFT
+        last = (address + length - 1) >> PAGE_SHIFT
+        return ((1 << (last - first + 1)) - 1) << first
+
+    def check_watchpoints(self,
+        address: int,
+        length: int,
+        is_write: bool) -> None:
+        """
+        Calls the watch handler for each watchpoint the access hits.
+
+        Watchpoints are suspended while the handler runs, so inspecting
+        memory from the debugger doesn't trap again.
+        """
+        if address + length > MEMORY_SIZE:
+            self.check_watchpoints(address, MEMORY_SIZE - address, is_write)
+            self.check_watchpoints(0, address + length - MEMORY_SIZE, is_write)
+            return
+        if not self.watched_pages & self.get_page_mask(address, length):
+            return
+        end = address + length
+        hits = [
+            watchpoint for watchpoint in self.watchpoints
+            if address < watchpoint.end and end > watchpoint.start
+            and (watchpoint.on_write if is_write else watchpoint.on_read)
+        ]
+        if not hits or self.watch_handler is None:
+            return
+        self.watched_pages = 0
+        try:
+            for watchpoint in hits:
+                self.watch_handler(watchpoint, address, length, is_write)
+        finally:
+            # The handler may have added or removed watchpoints.
+            self.update_watched_pages()
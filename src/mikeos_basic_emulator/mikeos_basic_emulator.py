@@ -1,10 +1,10 @@
 import logging
 import time
-from queue import Queue
 import cProfile
 
 from environment import Environment
-from runcmd import CommandRunnerThread
+from runcmd import CommandQueue, CommandRunnerThread
+from constants import DEBUGGER_ENABLED
 from constants import EMULATED_MIKEOS_VERSION_STRING as OS_VERSION
 from constants import EMULATED_MIKEOS_COMMAND_LIST as COMMANDS
 
@@ -17,6 +17,10 @@ def main():
     display_preamble(env)
     load_program(cmdqueue, 'EXAMPLE.BAS')
     #load_program(cmdqueue, 'APP.BAS')
+    run_display_loop(env)
+
+def run_display_loop(env: Environment) -> None:
+    """ Services the display on the main thread until the program ends. """
     try:
         while not (env.display.has_exited() or env.debugger.finished):
             env.display.handle_events()
@@ -27,14 +31,15 @@ def main():
 
     env.display.exit()
 
-def setup_interpreter(env: Environment) -> Queue[str]:
+def setup_interpreter(env: Environment) -> CommandQueue:
     env.display.open_window()
     env.display.update()
     env.filesystem.read_files()
-    env.debugger.enable()
+    if DEBUGGER_ENABLED:
+        env.debugger.enable()
     # TODO: Make this a config option.
     #env.debugger.enable_debug_on_exit()
-    cmdqueue: Queue[str] = Queue()
+    cmdqueue: CommandQueue = CommandQueue()
     interpreter = CommandRunnerThread(env, cmdqueue)
     interpreter.start()
     return cmdqueue
@@ -44,10 +49,10 @@ def display_preamble(env: Environment) -> None:
     env.display.print(f'Commands: {", ".join(COMMANDS)}\n')
     env.display.print('> PROGRAM.BAS\n')
     
-def add_program(cmdqueue: Queue[str], filename: str) -> None:
+def add_program(cmdqueue: CommandQueue, filename: str) -> None:
     cmdqueue.put(f'INCLUDE "{filename}"')
     
-def load_program(cmdqueue: Queue[str], program: str) -> None:
+def load_program(cmdqueue: CommandQueue, program: str) -> None:
     add_program(cmdqueue, program)
     cmdqueue.put('GOTO PROGSTART')
     cmdqueue.put('/RUN')
@@ -0,0 +1,95 @@
+# This is the pacing module of the MikeOS Basic Emulator.
+# It limits how fast program lines run to roughly match real hardware.
+
+import math
+import time
+
+class LinePacer:
+    """
+    Limits the interpreter to a target number of lines per second.
+
+    A token bucket is used:
+    - Tokens are added at the target rate, up to the bucket capacity.
+    - Each line takes one token.
+    - When the bucket runs dry the interpreter sleeps until it is refilled.
+
+    The capacity (the burst size) is one sleep granularity worth of lines.
+    Sleeps are only taken once the debt is at least that long, so the
+    interpreter never spins and never takes lots of tiny, inaccurate sleeps.
+    Time spent blocked (e.g. in `WAITKEY`) refills the bucket but it cannot
+    overflow, so a program doesn't race ahead to "catch up" afterwards.
+
+    `time.sleep` uses high resolution timers on Python 3.11+ so there is no
+    busy waiting. The overshoot of every sleep is recorded as the jitter.
+    """
+    def __init__(self, lines_per_second: float,
+        granularity: float = 0.002) -> None:
+
+        self.rate = lines_per_second
+        self.granularity = granularity
+        self.capacity = max(1.0, lines_per_second * granularity)
+        self.reset()
+
+    def reset(self) -> None:
+        """ Starts pacing again with a full bucket and no statistics. """
+        self.tokens = self.capacity
+        self.last_refill = time.perf_counter()
+        self.lines = 0
+        self.started = self.last_refill
+        self.sleeps = 0
+        self.jitter_total = 0.0
+        self.jitter_squares = 0.0
+        self.jitter_max = 0.0
+
+    def wait(self, lines: int = 1) -> None:
+        """ Takes tokens for the given number of lines, sleeping if needed. """
+        now = time.perf_counter()
+        self.tokens = min(
+            self.capacity,
+            self.tokens + (now - self.last_refill) * self.rate
+        ) - lines
+        self.last_refill = now
+        self.lines += lines
+
+        if self.tokens > -self.capacity:
+            return
+
+        delay = -self.tokens / self.rate
+        time.sleep(delay)
+        woken = time.perf_counter()
+        self.record_jitter(woken - now - delay)
+
+    def record_jitter(self, oversleep: float) -> None:
+        self.sleeps += 1
+        self.jitter_total += oversleep
+        self.jitter_squares += oversleep * oversleep
+        self.jitter_max = max(self.jitter_max, oversleep)
+
+    def get_rate(self) -> float:
+        """ Returns the measured lines per second since the last reset. """
+        elapsed = time.perf_counter() - self.started
+        if elapsed <= 0:
+            return 0.0
+        return self.lines / elapsed
+
+    def get_jitter(self) -> tuple[float, float, float]:
+        """
+        Returns the mean, RMS and maximum sleep overshoot in seconds.
+        """
+        if self.sleeps == 0:
+            return 0.0, 0.0, 0.0
+        return (
+            self.jitter_total / self.sleeps,
+            math.sqrt(self.jitter_squares / self.sleeps),
+            self.jitter_max,
+        )
+
+    def report(self) -> str:
+        mean, rms, worst = self.get_jitter()
+        return (
+            f'target {self.rate:.0f} lines/s, '
+            f'measured {self.get_rate():.0f} lines/s, '
+            f'jitter mean {mean * 1e6:.0f} us, '
+            f'rms {rms * 1e6:.0f} us, '
+            f'max {worst * 1e6:.0f} us over {self.sleeps} sleeps'
+        )
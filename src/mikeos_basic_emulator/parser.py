@@ -94,6 +94,9 @@ class CommandParser:
                         include_next = True
                 elif char == ' ':
                     continue
+                # A symbol is always a token on its own, e.g. '(' in '(A'.
+                elif not char.isalnum():
+                    output.append(char)
                 else:
                     word += char
 
@@ -173,9 +176,13 @@ class CommandParser:
         
     def as_number(self, token: str) -> Token:
         try:
-            return Token(TokenType.NUMBER, int(token))
+            value = int(token)
         except ValueError:
             raise DecodingError(f'Invalid number token: "{token}"')
+        # Numbers (and so constant addresses) are 16-bit in MikeOS.
+        if value > 65535:
+            raise DecodingError(f'Number out of range (0-65535): "{token}"')
+        return Token(TokenType.NUMBER, value)
         
     def as_quote(self, token: str) -> Token:
         if token.startswith('"') and token.endswith('"'):
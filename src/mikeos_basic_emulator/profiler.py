@@ -0,0 +1,168 @@
+# This is the memory profiler of the MikeOS Basic Emulator.
+# It counts reads and writes to each address and exports them as a heatmap.
+
+from pathlib import Path
+
+import numpy as np
+import pygame
+
+from memory import ADDRESS_MASK, MEMORY_SIZE, PAGE_SHIFT, Memory
+
+PAGE_SIZE = 1 << PAGE_SHIFT
+
+
+class ProfiledMemory(Memory):
+    """
+    Memory that counts every read and write of each address.
+
+    Counters are kept in numpy arrays (`reads` and `writes`) so ranges,
+    such as LOAD, SAVE and strings, are counted with one slice add.
+
+    Views can't be counted, so `view_words()` always returns None and
+    VariableManager doesn't cache strings, so variables go through the
+    counted methods.
+    This makes the emulator slower, so it's only used when enabled in the
+    `[profiler]` section of config.toml.
+    """
+    counts_accesses = True
+
+    def __init__(self, backing_file: str|Path|None = None) -> None:
+        super().__init__(backing_file)
+        self.reads = np.zeros(MEMORY_SIZE, dtype=np.uint64)
+        self.writes = np.zeros(MEMORY_SIZE, dtype=np.uint64)
+
+    def read_byte(self, address: int) -> int:
+        self.reads[address & ADDRESS_MASK] += 1
+        return super().read_byte(address)
+
+    def read_word(self, address: int) -> int:
+        count(self.reads, address, 2)
+        return super().read_word(address)
+
+    def write_byte(self, address: int, value: int) -> None:
+        self.writes[address & ADDRESS_MASK] += 1
+        super().write_byte(address, value)
+
+    def write_word(self, address: int, value: int) -> None:
+        count(self.writes, address, 2)
+        super().write_word(address, value)
+
+    def view_string(self,
+        address: int,
+        limit: int = 127,
+        terminator: int = 0) -> memoryview:
+
+        view = super().view_string(address, limit, terminator)
+        count(self.reads, address, max(len(view), 1))
+        return view
+
+    def read_string(self,
+        address: int,
+        limit: int = 127,
+        terminator: int = 0) -> str:
+
+        # read_line() is counted here too.
+        string = super().read_string(address, limit, terminator)
+        count(self.reads, address, max(len(string), 1))
+        return string
+
+    def write_string(self,
+        address: int,
+        string: str,
+        limit: int = 127) -> None:
+
+        count(self.writes, address, min(len(string), limit))
+        super().write_string(address, string, limit)
+
+    def read_data(self, address: int, length: int) -> bytearray:
+        count(self.reads, address, length)
+        return super().read_data(address, length)
+
+    def view_data(self, address: int, length: int) -> memoryview:
+        count(self.reads, address, length)
+        return super().view_data(address, length)
+
+    def view_words(self, address: int, count: int) -> memoryview|None:
+        return None
+
+    def write_data(self, address: int, data: bytes|bytearray) -> None:
+        count(self.writes, address, len(data))
+        super().write_data(address, data)
+
+    def copy_data(self, source: int, destination: int, length: int) -> None:
+        count(self.reads, source, length)
+        count(self.writes, destination, length)
+        super().copy_data(source, destination, length)
+
+    def fill_data(self, address: int, value: int, length: int) -> None:
+        count(self.writes, address, length)
+        super().fill_data(address, value, length)
+
+    def compare_data(self, first: int, second: int, length: int) -> int:
+        count(self.reads, first, length)
+        count(self.reads, second, length)
+        return super().compare_data(first, second, length)
+
+    def get_page_counts(self) -> tuple[np.ndarray, np.ndarray]:
+        """ Returns the reads and writes totalled for each page. """
+        return (
+            self.reads.reshape(-1, PAGE_SIZE).sum(axis=1),
+            self.writes.reshape(-1, PAGE_SIZE).sum(axis=1),
+        )
+
+    def save_heatmap(self, path: str|Path) -> None:
+        """
+        Saves the counters as a PNG image or a CSV file.
+
+        The format is chosen by the file extension.
+        """
+        if Path(path).suffix.lower() == '.csv':
+            self.save_heatmap_csv(path)
+        else:
+            self.save_heatmap_image(path)
+
+    def save_heatmap_csv(self, path: str|Path) -> None:
+        """ Writes one row for each address that was accessed. """
+        addresses = np.flatnonzero(self.reads + self.writes)
+        table = np.column_stack((
+            addresses,
+            addresses >> PAGE_SHIFT,
+            self.reads[addresses],
+            self.writes[addresses],
+        ))
+        np.savetxt(path, table, fmt='%d', delimiter=',',
+            header='address,page,reads,writes', comments='')
+
+    def save_heatmap_image(self, path: str|Path) -> None:
+        """
+        Draws memory as a 256 x 256 grid with one row per page.
+
+        Reads are shown in green and writes in red, on a log scale so
+        rarely used areas are still visible next to hot loops.
+        """
+        pixels = np.zeros((PAGE_SIZE, MEMORY_SIZE // PAGE_SIZE, 3),
+            dtype=np.uint8)
+        # surfarray indexes by (x, y), so the pages become columns here.
+        pixels[:, :, 0] = scale_counts(self.writes).reshape(-1, PAGE_SIZE).T
+        pixels[:, :, 1] = scale_counts(self.reads).reshape(-1, PAGE_SIZE).T
+        surface = pygame.surfarray.make_surface(pixels)
+        surface = pygame.transform.scale_by(surface, 2)
+        pygame.image.save(surface, str(path))
+
+
+def count(counters: np.ndarray, address: int, length: int) -> None:
+    """ Adds one to the counter of each address, wrapping at 64 kiB. """
+    address &= ADDRESS_MASK
+    length = max(0, min(length, MEMORY_SIZE))
+    end = address + length
+    counters[address:end] += 1
+    if end > MEMORY_SIZE:
+        counters[:end - MEMORY_SIZE] += 1
+
+def scale_counts(counts: np.ndarray) -> np.ndarray:
+    """ Maps access counts to 0-255 on a log scale. """
+    logs = np.log1p(counts.astype(np.float64))
+    peak = logs.max()
+    if peak == 0:
+        return np.zeros(counts.shape, dtype=np.uint8)
+    return (logs * (255 / peak)).astype(np.uint8)
@@ -1,14 +1,24 @@
 # The is the command runner for the emulator.
 # It imports and adds all commands.
 
+from concurrent.futures import Future
 from threading import Thread
 import queue
 from queue import Queue
 import time
 
 from parser import CommandParser
-from arglist import CommandArgumentList, CommandRoutine
+from arglist import CommandArgumentList, CommandRoutine, ParsedCommand
+from compiler import CompiledProgram, DispatchChain, ProgramLine
+from constants import (
+    DEFAULT_LOAD_POINT,
+    EMULATED_LINES_PER_SECOND,
+    MEMORY_HEATMAP_FILE,
+)
 from environment import Environment
+from pacer import LinePacer
+from profiler import ProfiledMemory
+from variables import ForVariable
 from instructions.builtins import all_commands as builtin_commands
 from instructions.screen import all_commands as display_commands
 from instructions.control import all_commands as control_commands
@@ -30,6 +40,16 @@ all_commands: list[dict[str, CommandRoutine]] = [
     data_commands,
 ]
 
+# The most lines kept parsed, it's cleared if more are run (e.g. typed).
+PARSED_COMMAND_LIMIT = 4096
+
+# How many basic blocks of the program are run between checks of the queue.
+BLOCKS_PER_QUEUE_CHECK = 16
+
+# A line of a basic block, ready to run, and True if the compiler has a
+# quicker way to run it (see `run_compiled_line()`).
+PreparedLine = tuple[ProgramLine, ParsedCommand, bool]
+
 class InterpreterSyntaxError(Exception):
     """ For when a command has a syntax error. """
     
@@ -37,9 +57,40 @@ class EndOfProgramError(Exception):
     """ For when the end of the program is reached. """
 
 
+class CommandBatch:
+    """
+    A group of commands submitted to the interpreter as one queue item.
+
+    The commands are parsed when the batch is made, so a syntax error is
+    raised to the submitter and the interpreter thread doesn't re-parse them.
+    Special commands (e.g. `/RUN`) are decoded once here as well.
+
+    The interpreter runs the whole batch in one go and then completes
+    `future`. If a command raises, the rest of the batch is skipped and
+    the exception is set on the future instead.
+    """
+    def __init__(self,
+        commands: list[str],
+        parser: CommandParser,
+        env: Environment) -> None:
+
+        self.commands: list[CommandArgumentList|str] = []
+        for command in commands:
+            if command.startswith('/'):
+                self.commands.append(command[1:].strip().upper())
+            else:
+                tokens = parser.parse(command)
+                self.commands.append(
+                    CommandArgumentList(tokens, env.variables))
+        self.future: Future[None] = Future()
+
+
+CommandQueue = Queue[str|CommandBatch]
+
+
 class CommandRunnerThread(Thread):
     """ Used to run commands in a separate thread. """
-    def __init__(self, env: Environment, command_queue: Queue[str]) -> None:
+    def __init__(self, env: Environment, command_queue: CommandQueue) -> None:
         super().__init__()
         self.env = env
         self.queue = command_queue
@@ -48,28 +99,68 @@ class CommandRunnerThread(Thread):
         self.env.set_command_runner(self.interpreter)
         self.running_from_memory = False
         self.all_done = False
+        self.pacer: LinePacer|None = None
+        if EMULATED_LINES_PER_SECOND > 0:
+            self.pacer = LinePacer(EMULATED_LINES_PER_SECOND)
         
     def run(self) -> None:
         while not (self.all_done or self.env.program_finished):
-            if self.env.next_command is not None:
-                self.interpreter.run_command(self.env.next_command)
-                self.env.next_command = None
-
             try:
                 self.run_from_queue()
             except queue.Empty:
                 self.run_from_memory()
                 
             time.sleep(0)
+        if self.pacer is not None:
+            self.env.debugger.info('PACER', self.pacer.report())
+        if isinstance(self.env.memory, ProfiledMemory):
+            self.env.memory.save_heatmap(MEMORY_HEATMAP_FILE)
+            self.env.debugger.info('PROFILER',
+                f'Memory heatmap saved to {MEMORY_HEATMAP_FILE}')
         self.env.display.exit()
             
     def run_from_queue(self) -> None:
         command = self.queue.get(block=False)
-        if command.startswith('/'):
+        if isinstance(command, CommandBatch):
+            self.run_batch(command)
+        elif command.startswith('/'):
             self.run_special_command(command[1:])
         else:
             self.interpreter.run_command(command)
         self.queue.task_done()
+
+    def submit(self, commands: list[str]) -> Future[None]:
+        """
+        Queues a list of commands to be run together.
+
+        Returns a future that completes once they have all run.
+        A callback can be attached with `add_done_callback()`.
+        """
+        batch = CommandBatch(commands, self.interpreter.parser, self.env)
+        self.queue.put(batch)
+        return batch.future
+
+    def submit_script(self, script: str) -> Future[None]:
+        """ Queues every line of a script to be run together. """
+        return self.submit(script.splitlines())
+
+    def run_batch(self, batch: CommandBatch) -> None:
+        if not batch.future.set_running_or_notify_cancel():
+            return
+        try:
+            for command in batch.commands:
+                if isinstance(command, str):
+                    self.run_special_command(command)
+                    continue
+                self.interpreter.run_command(command)
+        except BaseException as error:
+            # The future is always finished, even if the thread is stopping
+            # (e.g. SystemExit when the window closes), so no one waits on it.
+            batch.future.set_exception(error)
+            if not isinstance(error, Exception):
+                raise
+        else:
+            batch.future.set_result(None)
         
     def run_special_command(self, command: str) -> None:
         """ Run commands added by the queue by the loader or debugger. """
@@ -78,12 +169,43 @@ class CommandRunnerThread(Thread):
             self.all_done = True
         elif command == 'RUN':
             self.running_from_memory = True
+            for error in self.env.get_program().errors:
+                self.env.debugger.error('COMPILE', error)
+            graph = self.env.get_graph()
+            for error in graph.errors:
+                self.env.debugger.error('FLOW', error)
+            for warning in graph.warnings:
+                self.env.debugger.warning('FLOW', warning)
+            if self.pacer is not None:
+                self.pacer.reset()
+            if self.env.debugger.snapshots is not None:
+                self.env.debugger.snapshots.reset()
             
     def run_from_memory(self) -> None:
-        """ Run commands from the program memory. """
+        """
+        Run commands from the program memory.
+
+        Lines are run a basic block at a time, with the queue only checked
+        after a few blocks. Lines that can't be run in a block (e.g. while
+        commands are logged) are run one at a time.
+        """
         if not self.running_from_memory:
             return
-        
+        for _ in range(BLOCKS_PER_QUEUE_CHECK):
+            if not self.interpreter.run_block(self.pacer):
+                self.run_line_from_memory()
+                return
+            if self.env.program_finished:
+                return
+
+    def run_line_from_memory(self) -> None:
+        # Snapshots are taken before the line is read, so they start on it.
+        if self.env.debugger.snapshots is not None:
+            self.env.debugger.snapshots.on_line(self.env)
+        if self.interpreter.run_compiled_line():
+            if self.pacer is not None:
+                self.pacer.wait()
+            return
         try:
             line = self.interpreter.read_program_line()
         except EndOfProgramError:
@@ -91,12 +213,17 @@ class CommandRunnerThread(Thread):
             self.env.debugger.on_program_exit(self.env)
             return
         else:
+            if self.pacer is not None:
+                self.pacer.wait()
             self.interpreter.run_command(line)
 
 class CommandRunner:
     """ Run BASIC commands passed through `run_command()` """
     def __init__(self, env: Environment) -> None:
         self.parser = CommandParser()
+        self.parsed_commands: dict[str, ParsedCommand] = {}
+        self.blocks: dict[int, list[PreparedLine]] = {}
+        self.blocks_program: CompiledProgram|None = None
         self.commands: dict[str, CommandRoutine] = {}
         self.env = env
         self.register_all_commands()
@@ -133,12 +260,187 @@ class CommandRunner:
         return line
     
 
+    def step(self) -> None:
+        """
+        Runs the next line of the program.
+
+        Raises `EndOfProgramError` if the end of the program is reached.
+        """
+        if self.run_compiled_line():
+            return
+        self.run_command(self.read_program_line())
+
+    def run_compiled_line(self) -> bool:
+        """
+        Runs the next line directly, without reading or parsing it, if the
+        compiler found a quicker way to run it:
+        - a NEXT matched to the FOR loop that's running
+        - the start of a chain of IF ... THEN GOTO lines
+
+        Returns False if the line should be run the normal way, e.g. if a
+        loop was jumped into, commands are logged or reads of the program
+        are watched.
+        """
+        if (self.env.debugger.command_hook is not None or
+            self.is_program_watched()):
+            return False
+        # The program size only changes when a program is loaded, which
+        # also writes to it, so it's enough to check it's still compiled.
+        program = self.env.program
+        if program is None or self.env.memory.is_shared:
+            program = self.env.get_program()
+        address = self.env.next_line_address
+        for_var = program.next_loops.get(address)
+        if for_var is not None:
+            return self.run_counted_next(program, address, for_var)
+        chain = program.dispatch_chains.get(address)
+        if chain is not None:
+            self.run_dispatch_chain(chain)
+            return True
+        return False
+
+    def run_block(self, pacer: LinePacer|None = None) -> bool:
+        """
+        Runs the lines from the next line to the end of its basic block,
+        without reading them from memory or parsing them again.
+        Debugger snapshots are taken as if they were run one at a time.
+
+        The block stops early if a line goes somewhere else than the next
+        line (e.g. a LOOP without a matching DO), changes the program or
+        ends it.
+
+        Returns False if the next line should be run the normal way.
+        """
+        block = self.get_block()
+        if block is None:
+            return False
+        env = self.env
+        program = env.program
+        snapshots = env.debugger.snapshots
+        lines = 0
+        for line, parsed, compiled in block:
+            if (env.next_line_address != line.address or
+                env.program is not program or env.program_finished):
+                break
+            if snapshots is not None:
+                snapshots.on_line(env)
+            lines += 1
+            if compiled and self.run_compiled_line():
+                continue
+            env.program_counter = line.address
+            env.next_line_address = line.next_address
+            self.run_command(
+                CommandArgumentList(parsed.tokens, env.variables, parsed))
+        if pacer is not None:
+            pacer.wait(lines)
+        return True
+
+    def get_block(self) -> list[PreparedLine]|None:
+        """
+        Returns the basic block at the next line, ready to run, or None if
+        it has to be read line by line: while commands are logged, while
+        reads of the program are watched or counted, if the memory is
+        shared (another process could change a line part way through a
+        block) or if it's not a line of the program.
+        """
+        if (self.env.debugger.command_hook is not None or
+            self.env.memory.counts_accesses or self.env.memory.is_shared or
+            self.is_program_watched()):
+            return None
+        program = self.env.program
+        if program is None:
+            program = self.env.get_program()
+        if program is not self.blocks_program:
+            self.blocks = {}
+            self.blocks_program = program
+        address = self.env.next_line_address
+        block = self.blocks.get(address)
+        if block is None:
+            if address not in program.lines:
+                return None
+            block = self.prepare_block(program,
+                self.env.get_graph().get_block(address))
+            self.blocks[address] = block
+        return block if block else None
+
+    def prepare_block(self,
+        program: CompiledProgram,
+        lines: list[ProgramLine]) -> list[PreparedLine]:
+
+        block: list[PreparedLine] = []
+        for line in lines:
+            # Lines that don't parse or that `read_line()` would read
+            # differently (too long or with no newline) are left to it.
+            if (line.tokens is None or
+                line.next_address != line.address + len(line.text) + 1 or
+                self.env.memory.data[line.next_address - 1] != 0x0A):
+                break
+            parsed = ParsedCommand(line.tokens, self.env.variables)
+            compiled = (line.address in program.next_loops or
+                line.address in program.dispatch_chains)
+            block.append((line, parsed, compiled))
+        return block
+
+    def is_program_watched(self) -> bool:
+        """ Checks for a watchpoint on reads of the program. """
+        if not self.env.memory.watchpoints:
+            return False
+        end = DEFAULT_LOAD_POINT + \
+            self.env.variables.get_runtime_variable('prog_size')
+        return any(watchpoint.on_read and watchpoint.start < end and
+            watchpoint.end > DEFAULT_LOAD_POINT
+            for watchpoint in self.env.memory.watchpoints)
+
+    def run_counted_next(self,
+        program: CompiledProgram,
+        address: int,
+        for_var: ForVariable) -> bool:
+
+        name = for_var.iterator_variable_name
+        if self.env.for_variables.get(name) is not for_var:
+            return False
+
+        self.env.program_counter = address
+        if for_var.advance():
+            self.env.next_line_address = for_var.loop_start_pos
+        else:
+            del self.env.for_variables[name]
+            self.env.next_line_address = program.lines[address].next_address
+        return True
+
+    def run_dispatch_chain(self, chain: DispatchChain) -> None:
+        """
+        Runs a chain of IF ... THEN GOTO lines with one lookup.
+
+        It leaves `last_if_true` and `program_counter` as the last IF that
+        would have run leaves them, so an ELSE after the chain still works.
+        """
+        value = self.env.variables.get_numeric_variable(chain.variable)
+        target = chain.targets.get(value)
+        if target is None:
+            self.env.program_counter = chain.last_address
+            self.env.last_if_true = False
+            self.env.next_line_address = chain.end_address
+        else:
+            self.env.program_counter, label = target
+            self.env.last_if_true = True
+            self.env.next_line_address = label.to_program_pointer()
+
     def decode_arguments(self, line: str) -> CommandArgumentList:
         """
         Converts a line of BASIC code into a list of arguments.
+
+        Lines are kept parsed by their text, so a line in a loop is only
+        parsed (and its sums compiled) the first time round.
         """
-        parts = self.parser.parse(line)
-        return CommandArgumentList(parts, self.env.variables)
+        parsed = self.parsed_commands.get(line)
+        if parsed is None:
+            parts = self.parser.parse(line)
+            parsed = ParsedCommand(parts, self.env.variables)
+            if len(self.parsed_commands) >= PARSED_COMMAND_LIMIT:
+                self.parsed_commands.clear()
+            self.parsed_commands[line] = parsed
+        return CommandArgumentList(parsed.tokens, self.env.variables, parsed)
 
     def run_command(self, command: str|CommandArgumentList) -> None:
         """ 
@@ -158,8 +460,12 @@ class CommandRunner:
 
         # If a string was passed, convert it to a list of arguments.
         if isinstance(command, str):
-            self.env.debugger.log_command(f'Running command: "{command}"')
+            if self.env.debugger.command_hook is not None:
+                self.env.debugger.command_hook(command)
             command = self.decode_arguments(command)
+        # An argument list is logged from where it's up to, e.g. after THEN.
+        elif self.env.debugger.command_hook is not None:
+            self.env.debugger.command_hook(command.get_remaining_text())
         
         
         # Ignore empty lines, comments, labels, etc.
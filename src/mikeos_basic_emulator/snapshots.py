@@ -0,0 +1,112 @@
+# This is the snapshot ring of the MikeOS Basic Emulator's debugger.
+# It keeps a bounded history of memory and interpreter states for rewinding.
+
+from collections import deque
+import typing
+import zlib
+
+import numpy as np
+
+if typing.TYPE_CHECKING:
+    from environment import Environment, InterpreterState
+
+# Roughly what each snapshot costs besides its delta (the interpreter state).
+SNAPSHOT_OVERHEAD = 512
+
+
+class Snapshot:
+    """
+    One point in the history.
+
+    `line` is the number of program lines run before it was taken.
+    `delta` is this memory XOR the next newer snapshot's memory, compressed.
+    The newest snapshot has no delta, its memory is the ring's `latest`.
+    """
+    def __init__(self, line: int, state: 'InterpreterState') -> None:
+        self.line = line
+        self.state = state
+        self.delta: bytes|None = None
+
+    def get_size(self) -> int:
+        return SNAPSHOT_OVERHEAD + (len(self.delta) if self.delta else 0)
+
+
+class SnapshotRing:
+    """
+    Takes a snapshot every `interval` program lines for stepping back.
+
+    Only the newest memory image is kept whole. Each older snapshot keeps
+    the XOR of its memory with the next newer one, compressed with zlib.
+    Lines usually change a few bytes, so a delta is mostly zeroes and
+    compresses to around a hundred bytes.
+    To rebuild an older image the deltas are applied from the newest back.
+
+    When the deltas go over `budget` bytes the oldest snapshots are
+    dropped, so memory use stays bounded however long the program runs.
+    """
+    def __init__(self, interval: int, budget: int) -> None:
+        self.interval = interval
+        self.budget = budget
+        self.reset()
+
+    def reset(self) -> None:
+        """ Forgets the history, e.g. when a program is started again. """
+        self.snapshots: deque[Snapshot] = deque()
+        self.latest: np.ndarray|None = None
+        self.size = 0
+        self.lines_run = 0
+
+    def on_line(self, env: 'Environment') -> None:
+        """ Called before each program line is read and run. """
+        if self.lines_run % self.interval == 0 and not self.has_line_taken():
+            self.take(env)
+        self.lines_run += 1
+
+    def has_line_taken(self) -> bool:
+        """ Checks if the newest snapshot is of this line (after a rewind). """
+        return len(self.snapshots) > 0 and \
+            self.snapshots[-1].line == self.lines_run
+
+    def take(self, env: 'Environment') -> None:
+        image = np.frombuffer(env.memory.get_image(), dtype=np.uint8)
+        if self.latest is not None:
+            newest = self.snapshots[-1]
+            newest.delta = zlib.compress(
+                np.bitwise_xor(self.latest, image).tobytes(), 1)
+            self.size += len(newest.delta)
+        self.latest = image
+        self.snapshots.append(Snapshot(self.lines_run, env.save_state()))
+        self.size += SNAPSHOT_OVERHEAD
+        while self.size > self.budget and len(self.snapshots) > 1:
+            self.size -= self.snapshots.popleft().get_size()
+
+    def get_oldest_line(self) -> int:
+        if len(self.snapshots) == 0:
+            return self.lines_run
+        return self.snapshots[0].line
+
+    def rewind(self, env: 'Environment', line: int) -> int:
+        """
+        Restores the newest snapshot taken at or before the given line.
+
+        Newer snapshots are dropped, as the program may now go another way.
+        Returns the line the snapshot was taken at, or -1 if there isn't one.
+        """
+        if len(self.snapshots) == 0 or self.snapshots[0].line > line:
+            return -1
+        assert self.latest is not None
+        image = self.latest.copy()
+        while self.snapshots[-1].line > line:
+            self.size -= self.snapshots.pop().get_size()
+            older = self.snapshots[-1]
+            assert older.delta is not None
+            image ^= np.frombuffer(zlib.decompress(older.delta), dtype=np.uint8)
+            self.size -= len(older.delta)
+            older.delta = None
+
+        snapshot = self.snapshots[-1]
+        self.latest = image
+        env.memory.restore(image.tobytes())
+        env.restore_state(snapshot.state)
+        self.lines_run = snapshot.line
+        return snapshot.line
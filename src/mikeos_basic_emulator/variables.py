@@ -18,10 +18,17 @@ from constants import (
     DEFAULT_STRING_VARIABLES_LOCATION,
     DEFAULT_STRING_LENGTH,
 )
-from memory import Memory
+from memory import Memory, WriteListener
 from debugger import Debugger
 
 class ForVariable:
+    """
+    The state of a FOR loop, kept between its FOR and each NEXT.
+
+    The count is kept here in `state` and copied to the loop variable
+    after each change, so PEEK, PRINT and the debugger always see it.
+    `advance()` copies it with one store into the word view where it can.
+    """
     state: int
     end: int
     loop_start_pos: int
@@ -31,6 +38,7 @@ class ForVariable:
 
         self.iterator_variable_name = iterator_variable
         self.variables = variables
+        self.index = NUMERIC_VARIABLE_INDEXES.get(iterator_variable, -1)
         self.state = 0
         self.end = 0
         self.loop_start_pos = 0
@@ -51,6 +59,21 @@ class ForVariable:
         self.state += 1
         self.update_loop_variable()
 
+    def advance(self) -> bool:
+        """
+        Counts one time round the loop, for NEXT.
+
+        Returns True if the loop goes round again.
+        """
+        self.state += 1
+        words = self.variables.numeric_words
+        if (words is not None and self.index >= 0 and
+            self.variables.has_direct_numeric_access()):
+            words[self.index] = self.state & 0xFFFF
+        else:
+            self.update_loop_variable()
+        return self.state <= self.end
+
     def is_finished(self) -> bool:
         return self.state > self.end
     
@@ -70,6 +93,9 @@ class UndefinedRuntimeVariableError(Exception):
     """ For when a runtime variable is not defined. """
     pass
 
+# Maps each numeric variable name to its word index (A = 0, B = 1...).
+NUMERIC_VARIABLE_INDEXES = {chr(ord('A') + n): n for n in range(26)}
+
 class VariableManager:
     """ 
     Class to manage variables in the MikeOS Basic Emulator. 
@@ -83,6 +109,24 @@ class VariableManager:
     
     Numeric and string variables are stored in simulated memory.
     Program may need to access the underlying memory directly.
+
+    Numeric variables are read and written through a word view of their
+    block (`numeric_words`), so each access is one indexed load or store.
+    This is the same memory that PEEK and POKE see.
+    If no view is available the memory is accessed a byte at a time.
+
+    Decoded string variables are cached per slot. The cache is cleared for
+    a slot whenever memory tells us of a write that overlaps it, so writes
+    from POKE or file loads are picked up too.
+    This needs a write listener on the memory, which stays there (and is
+    checked on every write through Memory) until `close()` is called.
+    Strings aren't cached for a shared (file backed) memory, as writes by
+    other processes aren't reported.
+
+    Both shortcuts skip the Memory methods, so they're only taken while no
+    watchpoint covers the variable pages. Watched variables go through
+    Memory and trap like any other access. The string cache isn't used if
+    the memory counts its accesses (for the profiler).
     """
     def __init__(self, memory: Memory, debugger: Debugger) -> None:
 
@@ -90,16 +134,56 @@ class VariableManager:
         self.numeric_variable_base_pointer = DEFAULT_NUMERIC_VARIABLES_LOCATION
         self.string_variable_base_pointer = DEFAULT_STRING_VARIABLES_LOCATION
         self.debugger = debugger
+        self.numeric_words = memory.view_words(
+            self.numeric_variable_base_pointer, 26)
+        self.numeric_pages = memory.get_page_mask(
+            self.numeric_variable_base_pointer, 52)
+        self.string_cache: list[str|None] = [None] * 8
+        self.string_pages = memory.get_page_mask(
+            self.string_variable_base_pointer, 8 * (DEFAULT_STRING_LENGTH + 1))
+        self.string_listener: WriteListener|None = None
+        if not memory.is_shared:
+            self.string_listener = self.memory.add_write_listener(
+                self.string_variable_base_pointer,
+                self.string_variable_base_pointer +
+                    8 * (DEFAULT_STRING_LENGTH + 1),
+                self.invalidate_string_cache,
+            )
         self.runtime_variables: dict[str, int] = {}
         self.palette_variables: dict[str, PalettePair] = {}
         self.set_default_runtime_variables()
         self.set_default_palette_variables()
         
+    def close(self) -> None:
+        """
+        Stops listening to the memory, when it's no longer used.
+        Strings are read from memory each time after this.
+        """
+        if self.string_listener is not None:
+            self.memory.remove_write_listener(self.string_listener)
+            self.string_listener = None
+        self.string_cache = [None] * 8
+
+    def has_direct_numeric_access(self) -> bool:
+        """
+        Checks if numeric variables can be stored straight into
+        `numeric_words`, as nothing is logging or watching them.
+        """
+        return (self.debugger.set_variable_hook is None and
+            not self.memory.watched_pages & self.numeric_pages)
+
     def get_numeric_variable(self, variable: str) -> int:
         """ 
         Returns the value of a numeric variable passed as a string. 
         e.g. 'A' for numeric variable A.
         """
+        if (self.numeric_words is not None and
+            not self.memory.watched_pages & self.numeric_pages):
+            try:
+                return self.numeric_words[NUMERIC_VARIABLE_INDEXES[variable]]
+            except KeyError:
+                raise InvalidVariableError(
+                    f'Invalid numeric variable: {variable}')
         addr = self.get_numeric_variable_pointer(variable)
         return self.memory.read_word(addr)
     
@@ -109,8 +193,24 @@ class VariableManager:
         e.g. '$1' for string variable 1.
         It will be at most 127 characters long.
         """
-        addr = self.get_string_variable_pointer(variable)
-        return self.memory.read_string(addr, DEFAULT_STRING_LENGTH);
+        n = self.get_string_variable_index(variable)
+        value = self.string_cache[n]
+        if value is None or self.memory.watched_pages & self.string_pages:
+            addr = self.get_string_variable_pointer(variable)
+            value = self.memory.read_string(addr, DEFAULT_STRING_LENGTH)
+            if (self.string_listener is not None and
+                not self.memory.counts_accesses):
+                self.string_cache[n] = value
+        return value
+
+    def invalidate_string_cache(self, address: int, length: int) -> None:
+        """ Forgets the cached value of any string slot in the range. """
+        slot_size = DEFAULT_STRING_LENGTH + 1
+        first = (address - self.string_variable_base_pointer) // slot_size
+        last = (address + length - 1 - self.string_variable_base_pointer) \
+            // slot_size
+        for n in range(max(first, 0), min(last, 7) + 1):
+            self.string_cache[n] = None
         
     def set_numeric_variable(self, variable: str, value: int) -> None:
         """
@@ -120,9 +220,17 @@ class VariableManager:
         Otherwise, an InvalidVariableError is raised.
         """
         # Constraint the value to 16-bit unsigned integer.
-        value = value % (2 ** 16)
-        if self.debugger:
-            self.debugger.log_set_variable(variable, value)
+        value = value & 0xFFFF
+        if self.debugger.set_variable_hook is not None:
+            self.debugger.set_variable_hook(variable, value)
+        if (self.numeric_words is not None and
+            not self.memory.watched_pages & self.numeric_pages):
+            try:
+                self.numeric_words[NUMERIC_VARIABLE_INDEXES[variable]] = value
+            except KeyError:
+                raise InvalidVariableError(
+                    f'Invalid numeric variable: {variable}')
+            return
         addr = self.get_numeric_variable_pointer(variable)
         self.memory.write_word(addr, value)
         
@@ -142,10 +250,10 @@ class VariableManager:
         Numerical variables always have a real (two byte) address 
         within in the simulated memory.
         """
-        n = ord(variable) - ord('A')
-        if n < 0 or n > 25:
+        if variable not in NUMERIC_VARIABLE_INDEXES:
             raise InvalidVariableError(f'Invalid numeric variable: {variable}')
-        return self.numeric_variable_base_pointer + n * 2
+        return (self.numeric_variable_base_pointer +
+            NUMERIC_VARIABLE_INDEXES[variable] * 2)
     
     def get_string_variable_pointer(self, variable: str) -> int:
         """
@@ -153,6 +261,12 @@ class VariableManager:
         String variables are stored as ASCII strings in the simulated memory.
         A contigous 128-byte block is reserved for each string variable.
         """
+        n = self.get_string_variable_index(variable)
+        return (self.string_variable_base_pointer + n * 
+            (DEFAULT_STRING_LENGTH + 1))
+
+    def get_string_variable_index(self, variable: str) -> int:
+        """ Returns the slot number of a string variable ($1 is 0). """
         if variable[0] != '$':
             raise InvalidVariableError(f'Invalid string variable: {variable}')
 
@@ -163,8 +277,7 @@ class VariableManager:
 
         if n < 0 or n > 7:
             raise InvalidVariableError(f'Invalid string variable: {variable}')
-        return (self.string_variable_base_pointer + n * 
-            (DEFAULT_STRING_LENGTH + 1))
+        return n
 
     def get_label_pointer(self, label: str) -> int:
         """
@@ -0,0 +1,19 @@
+# This is shared by the tests of the MikeOS Basic Emulator.
+# It loads a program into a new environment, ready to run.
+
+from environment import Environment
+from runcmd import CommandQueue, CommandRunner, CommandRunnerThread
+
+def load(program: str) -> tuple[Environment, CommandRunner]:
+    env = Environment()
+    runner = CommandRunner(env)
+    env.set_command_runner(runner)
+    env.load_program(program)
+    return env, runner
+
+def load_thread(program: str) -> tuple[Environment, CommandRunnerThread]:
+    env = Environment()
+    thread = CommandRunnerThread(env, CommandQueue())
+    env.load_program(program)
+    thread.running_from_memory = True
+    return env, thread
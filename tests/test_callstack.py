@@ -0,0 +1,47 @@
+# This tests the GOSUB call stack of the MikeOS Basic Emulator.
+# It checks the fixed capacity and the stack overflow error.
+
+from callstack import CallStack
+from constants import DEFAULT_LOAD_POINT, GOSUB_DEPTH_LIMIT
+from runcmd import EndOfProgramError
+from tests.helpers import load
+
+def test_push_and_pop() -> None:
+    stack = CallStack(3)
+    stack.push(10)
+    stack.push(20)
+    assert len(stack) == 2
+    assert stack.get_addresses() == [10, 20]
+    assert stack.pop() == 20
+    assert stack.pop() == 10
+    assert len(stack) == 0
+
+def test_capacity() -> None:
+    stack = CallStack(2)
+    stack.push(1)
+    assert not stack.is_full()
+    stack.push(2)
+    assert stack.is_full()
+    stack.set_addresses([5])
+    assert not stack.is_full()
+    assert stack.pop() == 5
+
+def test_return_address_and_overflow() -> None:
+    program = 'A = 0\nrecurse:\nA = A + 1\nGOSUB recurse\nB = 1\n'
+    env, runner = load(program)
+    errors: list[str] = []
+    env.debugger.error = lambda msgtype, message: errors.append(message)
+    env.debugger.breakpoint = lambda env: None
+    try:
+        while True:
+            runner.step()
+    except EndOfProgramError:
+        pass
+    assert errors == ['Stack overflow at label recurse.']
+    assert len(env.gosub_stack) == GOSUB_DEPTH_LIMIT
+    # Every return address is the line after the GOSUB.
+    assert set(env.gosub_stack.get_addresses()) == {
+        DEFAULT_LOAD_POINT + program.index('B = 1')
+    }
+    assert env.variables.get_numeric_variable('A') == GOSUB_DEPTH_LIMIT + 1
+    assert env.variables.get_numeric_variable('B') == 1
@@ -0,0 +1,309 @@
+# This tests the compiler of the MikeOS Basic Emulator.
+# It checks block matching and that compiled programs run the same way.
+
+from constants import DEFAULT_LOAD_POINT
+import environment
+from environment import Environment
+from runcmd import CommandRunner, EndOfProgramError
+from tests.helpers import load
+
+NESTED_LOOPS = '''\
+A = 0
+DO
+FOR I = 1 TO 3
+FOR J = 1 TO 4
+A = A + 1
+NEXT J
+NEXT I
+B = B + 1
+LOOP UNTIL B = 5
+'''
+
+def run(env: Environment, runner: CommandRunner) -> None:
+    try:
+        while True:
+            runner.step()
+    except EndOfProgramError:
+        pass
+
+def address_of_line(env: Environment, number: int) -> int:
+    for line in env.get_program().lines.values():
+        if line.number == number:
+            return line.address
+    raise KeyError(number)
+
+def test_blocks_are_matched() -> None:
+    env, _ = load(NESTED_LOOPS)
+    program = env.get_program()
+    assert program.errors == []
+    assert program.do_lines == {address_of_line(env, 2)}
+    assert program.loop_targets == {
+        address_of_line(env, 9): address_of_line(env, 3),
+    }
+    assert set(program.for_loops) == {
+        address_of_line(env, 3), address_of_line(env, 4),
+    }
+    inner = program.for_loops[address_of_line(env, 4)]
+    assert inner.get_loop_start_position() == address_of_line(env, 5)
+
+def test_compiled_loops_run() -> None:
+    env, runner = load(NESTED_LOOPS)
+    outer = env.get_program().for_loops[address_of_line(env, 3)]
+    run(env, runner)
+    assert env.variables.get_numeric_variable('A') == 60
+    assert env.variables.get_numeric_variable('B') == 5
+    # Nothing was left on the stack and the FOR was never made again.
+    assert env.do_stack == []
+    assert env.get_program().for_loops[address_of_line(env, 3)] is outer
+
+def test_mismatched_blocks_are_reported() -> None:
+    env, _ = load('DO\nFOR I = 1 TO 2\nNEXT J\nLOOP ENDLESS\nLOOP ENDLESS\n')
+    assert env.get_program().errors == [
+        'Line 3: NEXT without FOR: J',
+        'Line 5: LOOP without DO',
+        'Line 2: FOR without NEXT: I',
+    ]
+
+def test_loop_after_then_continues_block() -> None:
+    program = '''\
+DO
+A = A + 1
+IF A < 3 THEN LOOP ENDLESS
+B = B + 1
+LOOP UNTIL A > 5
+'''
+    env, runner = load(program)
+    assert env.get_program().errors == []
+    run(env, runner)
+    assert env.variables.get_numeric_variable('A') == 6
+    assert env.variables.get_numeric_variable('B') == 4
+
+def test_writing_program_recompiles() -> None:
+    env, _ = load('DO\nLOOP ENDLESS\n')
+    program = env.get_program()
+    assert env.get_program() is program
+    env.memory.write_byte(DEFAULT_LOAD_POINT, ord('R'))
+    assert env.get_program() is not program
+    assert env.get_program().errors == ['Line 2: LOOP without DO']
+
+def test_writing_after_program_does_not_recompile() -> None:
+    env, _ = load('DO\nLOOP ENDLESS\n')
+    program = env.get_program()
+    env.memory.write_byte(DEFAULT_LOAD_POINT + 100, 1)
+    assert env.get_program() is program
+
+IF_BLOCKS = '''\
+IF A = 1 THEN
+B = 10
+IF C = 1 THEN
+B = 11
+ENDIF
+ELSE
+B = 20
+ENDIF
+IF A = 1 THEN PRINT "ONE"
+ELSE D = 5
+'''
+
+def test_if_blocks_are_matched() -> None:
+    env, _ = load(IF_BLOCKS)
+    program = env.get_program()
+    assert program.errors == []
+    assert program.if_targets == {
+        address_of_line(env, 1): address_of_line(env, 7),
+        address_of_line(env, 3): address_of_line(env, 6),
+    }
+    assert program.else_targets == {
+        address_of_line(env, 6): address_of_line(env, 9),
+    }
+
+def test_if_block_true_part() -> None:
+    env, runner = load(IF_BLOCKS)
+    env.variables.set_numeric_variable('A', 1)
+    env.variables.set_numeric_variable('C', 1)
+    run(env, runner)
+    assert env.variables.get_numeric_variable('B') == 11
+    assert env.variables.get_numeric_variable('D') == 0
+
+def test_if_block_false_part() -> None:
+    env, runner = load(IF_BLOCKS)
+    lines = 0
+    try:
+        while True:
+            runner.step()
+            lines += 1
+    except EndOfProgramError:
+        pass
+    assert env.variables.get_numeric_variable('B') == 20
+    # Single line IF and ELSE still work after a block.
+    assert env.variables.get_numeric_variable('D') == 5
+    # The true part was jumped over rather than read.
+    assert lines == 5
+
+def test_unmatched_if_blocks_are_reported() -> None:
+    env, _ = load('IF A = 1 THEN\nELSE\nELSE\nENDIF\nENDIF\nIF A = 2 THEN\n')
+    assert env.get_program().errors == [
+        'Line 3: ELSE without IF',
+        'Line 5: ENDIF without IF',
+        'Line 6: IF without ENDIF',
+    ]
+
+def test_counted_next_skips_reading_line() -> None:
+    env, runner = load('FOR I = 1 TO 3\nNEXT I\nA = I\n')
+    next_address = address_of_line(env, 2)
+    runner.step()
+    for _ in range(3):
+        assert env.next_line_address == next_address
+        assert runner.run_compiled_line()
+    assert 'I' not in env.for_variables
+    assert env.next_line_address == address_of_line(env, 3)
+    run(env, runner)
+    # The count is in the variable's memory, where PEEK would see it.
+    address = env.variables.get_numeric_variable_pointer('I')
+    assert env.memory.read_word(address) == 4
+    assert env.variables.get_numeric_variable('A') == 4
+
+def test_counted_next_needs_its_loop_running() -> None:
+    env, runner = load('FOR I = 1 TO 3\nNEXT I\n')
+    env.get_program()
+    env.next_line_address = address_of_line(env, 2)
+    assert not runner.run_compiled_line()
+
+def test_counted_next_is_logged() -> None:
+    env, runner = load('FOR I = 1 TO 3\nNEXT I\n')
+    logged: list[tuple[str, int]] = []
+    env.debugger.set_variable_hook = lambda name, value: \
+        logged.append((name, value))
+    run(env, runner)
+    assert logged == [('I', 1), ('I', 2), ('I', 3), ('I', 4)]
+
+def test_conditional_tail_is_logged() -> None:
+    env, runner = load('A = 1\nIF A = 1 THEN C = 5\nIF A = 2 THEN B = 1\n'
+        'ELSE B = A + 2\n')
+    logged: list[str] = []
+    env.debugger.command_hook = logged.append
+    run(env, runner)
+    assert logged == ['A = 1', 'IF A = 1 THEN C = 5', 'C = 5',
+        'IF A = 2 THEN B = 1', 'ELSE B = A + 2', 'B = A + 2']
+
+def test_compiled_lines_are_watched() -> None:
+    program = 'FOR I = 1 TO 3\nNEXT I\n'
+    env, runner = load(program)
+    next_line = DEFAULT_LOAD_POINT + program.index('NEXT')
+    reads: list[int] = []
+    env.memory.watch_handler = lambda watchpoint, address, length, is_write: \
+        reads.append(address)
+    env.memory.add_watchpoint(next_line, next_line + 1, on_read=True)
+    run(env, runner)
+    # The counted NEXT reads its line like any other, so it's trapped.
+    assert reads.count(next_line) == 3
+
+MENU = '''\
+IF A = 1 THEN GOTO one
+if a = 2 then goto two
+IF A = 'x' THEN GOTO three
+IF A = 1 THEN GOTO two
+ELSE B = 9
+END
+one:
+B = 1
+END
+two:
+B = 2
+END
+three:
+B = 3
+END
+'''
+
+def run_menu(choice: int) -> tuple[Environment, int]:
+    env, runner = load(MENU)
+    env.variables.set_numeric_variable('A', choice)
+    env.debugger.on_program_exit = lambda env: None
+    lines = 0
+    while env.variables.get_numeric_variable('B') == 0:
+        runner.step()
+        lines += 1
+    return env, lines
+
+def test_dispatch_chain_is_found() -> None:
+    env, _ = load(MENU)
+    chains = env.get_program().dispatch_chains
+    assert list(chains) == [DEFAULT_LOAD_POINT]
+    chain = chains[DEFAULT_LOAD_POINT]
+    assert chain.variable == 'A'
+    assert chain.length == 4
+    assert sorted(chain.targets) == [1, 2, ord('x')]
+    assert chain.end_address == address_of_line(env, 5)
+
+def test_dispatch_chain_jumps() -> None:
+    for choice, result in [(1, 1), (2, 2), (ord('x'), 3)]:
+        env, lines = run_menu(choice)
+        assert env.variables.get_numeric_variable('B') == result
+        # The chain is one step, then the label and the assignment.
+        assert lines == 3
+        assert env.last_if_true
+
+def test_dispatch_chain_falls_through() -> None:
+    env, lines = run_menu(5)
+    assert env.variables.get_numeric_variable('B') == 9
+    assert not env.last_if_true
+    assert lines == 2
+
+def test_chain_needs_the_same_variable() -> None:
+    env, _ = load('IF A = 1 THEN GOTO x\nIF B = 2 THEN GOTO x\nx:\n')
+    assert env.get_program().dispatch_chains == {}
+
+DATA = '''\
+READ table 2 A
+READ table 0 B
+READ mixed 1 C
+END
+table:
+10 20 30
+mixed:
+5 X 7
+'''
+
+def test_data_blocks_are_indexed() -> None:
+    env, runner = load(DATA)
+    env.debugger.on_program_exit = lambda env: None
+    blocks = env.get_program().data_blocks
+    # Blocks using variables are left until they're read.
+    assert list(blocks) == ['table']
+    assert list(blocks['table']) == [10, 20, 30]
+    env.variables.set_numeric_variable('X', 6)
+    for _ in range(3):
+        runner.step()
+    assert env.variables.get_numeric_variable('A') == 30
+    assert env.variables.get_numeric_variable('B') == 10
+    assert env.variables.get_numeric_variable('C') == 6
+    assert list(blocks['mixed']) == [5, 6, 7]
+
+def test_read_past_end_of_data_block() -> None:
+    env, runner = load('READ table 3 A\ntable:\n1 2 3\n')
+    errors: list[str] = []
+    env.debugger.error = lambda kind, message: errors.append(message)
+    env.debugger.breakpoint = lambda env: None
+    runner.step()
+    assert errors == [
+        'READ past the end of data block table: index 3, but it has 3 values.'
+    ]
+
+def test_writing_program_rebuilds_data_blocks() -> None:
+    env, _ = load(DATA)
+    assert list(env.get_program().data_blocks['table']) == [10, 20, 30]
+    env.memory.write_byte(address_of_line(env, 6), ord('4'))
+    assert list(env.get_program().data_blocks['table']) == [40, 20, 30]
+
+def test_shared_memory_program_is_checked(tmp_path, monkeypatch) -> None:
+    monkeypatch.setattr(environment, 'DEFAULT_MEMORY_BACKING_FILE',
+        tmp_path / 'memory.bin')
+    env, _ = load('DO\nLOOP ENDLESS\n')
+    assert env.memory.is_shared
+    program = env.get_program()
+    assert env.get_program() is program
+    # Written by another process, so the memory can't report it.
+    env.memory.data[DEFAULT_LOAD_POINT] = ord('R')
+    assert env.get_program() is not program
+    assert env.get_program().errors == ['Line 2: LOOP without DO']
@@ -0,0 +1,30 @@
+# This tests the debugger of the MikeOS Basic Emulator.
+# It checks that logging hooks are only bound while they're needed.
+
+from debugger import Debugger
+
+def test_hooks_unbound_by_default() -> None:
+    debugger = Debugger()
+    assert debugger.set_variable_hook is None
+    assert debugger.command_hook is None
+    debugger.print_hook('hello')
+    assert debugger.last_print == 'hello'
+
+def test_hooks_follow_enable_and_disable() -> None:
+    debugger = Debugger()
+    debugger.enable()
+    assert debugger.set_variable_hook is not None
+    assert debugger.command_hook is not None
+    debugger.disable()
+    assert debugger.set_variable_hook is None
+    assert debugger.command_hook is None
+
+def test_shown_type_binds_its_hook(capsys) -> None:
+    debugger = Debugger()
+    debugger.enable_type('SET')
+    assert debugger.command_hook is None
+    assert debugger.set_variable_hook is not None
+    debugger.set_variable_hook('A', 5)
+    assert capsys.readouterr().out == 'SET: A = 5\n'
+    debugger.disable_type('SET')
+    assert debugger.set_variable_hook is None
@@ -0,0 +1,62 @@
+# Stress test for the pygame display being drawn while it is printed to.
+# The interpreter and main threads share it, which must also hold up on
+# free-threaded (no GIL) builds of Python.
+
+import os
+import sys
+import threading
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from backend.pygame.display import PygameTextDisplay
+from debugger import Debugger
+from memory import Memory
+from variables import VariableManager
+
+debugger = Debugger()
+variables = VariableManager(Memory(), debugger)
+
+def print_lines(display: PygameTextDisplay, count: int) -> None:
+    for i in range(count):
+        display.print(f'Line {i} ' + '#' * (i % 60) + '\n')
+
+def make_display() -> PygameTextDisplay:
+    display = PygameTextDisplay(variables, debugger)
+    display.hide_cursor()
+    return display
+
+def test_print_and_scroll_while_rendering() -> None:
+    threaded = make_display()
+    writer = threading.Thread(target=print_lines, args=(threaded, 120))
+    # Switch threads as often as possible to shake out races with the GIL.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        writer.start()
+        while writer.is_alive():
+            threaded.update()
+        writer.join()
+    finally:
+        sys.setswitchinterval(interval)
+    threaded.update()
+
+    sequential = make_display()
+    print_lines(sequential, 120)
+    sequential.update()
+
+    assert pygame.image.tobytes(threaded.get_surface(), 'RGB') == \
+        pygame.image.tobytes(sequential.get_surface(), 'RGB')
+    assert threaded.get_cursor_position().row == \
+        sequential.get_cursor_position().row
+
+def test_cursor_reads_while_printing() -> None:
+    display = make_display()
+    writer = threading.Thread(target=print_lines, args=(display, 100))
+    writer.start()
+    while writer.is_alive():
+        position = display.get_cursor_position()
+        assert 0 <= position.row < display.lines
+        assert 0 <= position.col < display.columns
+    writer.join()
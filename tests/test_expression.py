@@ -0,0 +1,78 @@
+# This tests the expression compiler of the MikeOS Basic Emulator.
+# It checks precedence, brackets and the MikeOS left to right order.
+
+import pytest
+
+from arglist import CommandArgumentList
+from argument import ArgumentError, TokenTypeError
+from environment import Environment
+from expression import ExpressionCompiler
+from parser import CommandParser
+
+env = Environment()
+parser = CommandParser()
+
+def evaluate(sum: str, precedence: bool = True) -> int:
+    args = CommandArgumentList(parser.parse(sum), env.variables)
+    expression, index = ExpressionCompiler(args.args, precedence).compile(0)
+    assert index == len(args.args)
+    return expression()
+
+def test_precedence() -> None:
+    assert evaluate('2 + 3 * 4') == 14
+    assert evaluate('20 - 6 / 2 - 1') == 16
+    assert evaluate('7 + 10 % 4 * 3') == 13
+
+def test_brackets() -> None:
+    assert evaluate('(2 + 3) * 4') == 20
+    assert evaluate('100 / ((1 + 4) * (6 - 4))') == 10
+    assert evaluate('((((9))))') == 9
+
+def test_left_to_right() -> None:
+    assert evaluate('2 + 3 * 4', precedence=False) == 20
+    assert evaluate('20 - 6 / 2 - 1', precedence=False) == 6
+    # A bracket isn't a number, as in MikeOS.
+    args = CommandArgumentList(parser.parse('(2 + 3) * 4'), env.variables)
+    expression, _ = ExpressionCompiler(args.args, precedence=False).compile(0)
+    with pytest.raises(TokenTypeError):
+        expression()
+
+def test_variables_are_read_when_run() -> None:
+    args = CommandArgumentList(parser.parse('A * (B + 1)'), env.variables)
+    expression, _ = ExpressionCompiler(args.args, precedence=True).compile(0)
+    env.variables.set_numeric_variable('A', 3)
+    env.variables.set_numeric_variable('B', 4)
+    assert expression() == 15
+    env.variables.set_numeric_variable('B', 6)
+    assert expression() == 21
+
+def test_syntax_errors() -> None:
+    with pytest.raises(ArgumentError):
+        evaluate('(2 + 3')
+    with pytest.raises(ArgumentError):
+        evaluate('2 + 3)')
+    with pytest.raises(ArgumentError):
+        evaluate('2 *')
+
+def test_default_is_mikeos_order() -> None:
+    # The shipped config keeps MikeOS's left to right order.
+    args = CommandArgumentList(parser.parse('2 + 3 * 4'), env.variables)
+    assert args.do_numeric_sum() == 20
+
+def test_sum_stops_at_word(monkeypatch) -> None:
+    monkeypatch.setattr(ExpressionCompiler, 'precedence', True)
+    args = CommandArgumentList(parser.parse('(1 + 2) * 3 TO 10'), env.variables)
+    assert args.do_numeric_sum() == 9
+    args.get_specific_word('TO')
+    assert args.do_numeric_sum() == 10
+
+def test_compiled_sum_is_kept(monkeypatch) -> None:
+    monkeypatch.setattr(ExpressionCompiler, 'precedence', True)
+    args = CommandArgumentList(parser.parse('A = 1 + 2 * 3'), env.variables)
+    args.index = 2
+    assert args.do_numeric_sum() == 7
+    compiled = args.parsed.expressions[2]
+    again = CommandArgumentList(args.tokens, env.variables, args.parsed)
+    again.index = 2
+    assert again.do_numeric_sum() == 7
+    assert again.parsed.expressions[2] is compiled
@@ -0,0 +1,162 @@
+# This tests the control flow graph of the MikeOS Basic Emulator.
+# It checks the jumps it follows and the problems it reports.
+
+import time
+
+from constants import DEFAULT_LOAD_POINT
+from environment import Environment
+from flowgraph import ControlFlowGraph
+from tests.helpers import load
+
+GAME = '''\
+GOSUB setup
+mainloop:
+GETKEY K
+IF K = 'q' THEN GOTO finish
+IF K = 'h' THEN GOSUB help
+GOTO mainloop
+finish:
+END
+setup:
+X = 0
+RETURN
+help:
+PRINT "Press q to quit"
+RETURN
+'''
+
+def address_of_line(env: Environment, number: int) -> int:
+    for line in env.get_program().lines.values():
+        if line.number == number:
+            return line.address
+    raise KeyError(number)
+
+def test_jumps_are_followed() -> None:
+    env, _ = load(GAME)
+    graph = env.get_graph()
+    assert graph.errors == []
+    assert graph.warnings == []
+    assert not graph.has_unknown_jumps
+    line = lambda number: address_of_line(env, number)
+    assert graph.calls == {line(1): line(9), line(5): line(12)}
+    assert graph.successors[line(4)] == [line(7), line(5)]
+    assert graph.successors[line(6)] == [line(2)]
+    assert graph.successors[line(8)] == []
+    assert graph.returns == {line(11), line(14)}
+    assert graph.exits == {line(8)}
+    assert graph.labels['finish'] == line(7)
+
+def test_graph_is_rebuilt_with_program() -> None:
+    env, _ = load(GAME)
+    graph = env.get_graph()
+    assert env.get_graph() is graph
+    env.memory.write_byte(DEFAULT_LOAD_POINT, ord(' '))
+    assert env.get_graph() is not graph
+
+def test_blocks_and_loops_are_followed() -> None:
+    env, _ = load('''\
+DO
+FOR I = 1 TO 3
+IF I = 2 THEN NEXT I
+NEXT I
+LOOP UNTIL A = 1
+IF A = 1 THEN
+ELSE
+ENDIF
+''')
+    graph = env.get_graph()
+    line = lambda number: address_of_line(env, number)
+    assert graph.successors[line(3)] == [line(3), line(4)]
+    assert graph.successors[line(4)] == [line(3), line(5)]
+    assert graph.successors[line(5)] == [line(2), line(6)]
+    assert graph.successors[line(6)] == [line(8), line(7)]
+    # The ELSE part ends with the program.
+    assert graph.successors[line(7)] == []
+    assert graph.exits == {line(7), line(8)}
+
+def test_undefined_labels_are_reported() -> None:
+    env, _ = load('GOTO nowhere\nIF A = 1 THEN GOSUB missing\nREAD table 0 A\n')
+    assert env.get_graph().errors == [
+        'Line 1: Undefined label: nowhere',
+        'Line 2: Undefined label: missing',
+        'Line 3: Undefined label: table',
+    ]
+
+def test_unreachable_code_is_reported() -> None:
+    env, _ = load('''\
+GOTO start
+PRINT "never"
+A = 1
+start:
+READ numbers 0 A
+END
+B = 2
+numbers:
+1 2 3
+''')
+    assert env.get_graph().warnings == [
+        'Lines 2-3: Unreachable code',
+        'Line 7: Unreachable code',
+    ]
+
+def test_unknown_jumps_hide_unreachable_code() -> None:
+    env, _ = load('GOTO PROGSTART\nPRINT "maybe"\n')
+    graph = env.get_graph()
+    assert graph.has_unknown_jumps
+    assert graph.warnings == []
+
+def test_unbalanced_subroutines_are_reported() -> None:
+    env, _ = load('''\
+GOSUB sub
+GOSUB leaky
+sub:
+RETURN
+leaky:
+GOTO leaky
+''')
+    assert env.get_graph().errors == [
+        'Line 4: RETURN without GOSUB',
+        'Line 5: Subroutine never reaches RETURN',
+    ]
+
+def test_label_inside_another_line() -> None:
+    env, _ = load('GOTO one\ngone:\nEND\none:\n')
+    graph = env.get_graph()
+    # Like the interpreter, it finds the first `one:`, which is in `gone:`.
+    assert graph.labels['one'] == address_of_line(env, 3)
+    assert graph.warnings == ['Line 1: Label one is found inside line 2']
+
+def test_indented_label_is_its_own_line() -> None:
+    env, _ = load('GOTO skip\n    skip:\nGOTO finish\nhexfinish:\nEND\n')
+    graph = env.get_graph()
+    assert graph.labels['skip'] == address_of_line(env, 2)
+    # `finish:` is only found inside `hexfinish:`, so that's still reported.
+    assert graph.warnings == ['Line 3: Label finish is found inside line 4']
+
+def test_full_program_area_is_quick() -> None:
+    part = GAME.replace('setup', 'setup{n}').replace('help', 'help{n}') \
+        .replace('mainloop', 'mainloop{n}').replace('finish', 'finish{n}')
+    program = ''
+    n = 0
+    while len(program) < 32000:
+        program += part.replace('{n}', chr(97 + n % 26) * (n // 26 + 1))
+        n += 1
+    env, _ = load(program)
+    env.get_program()
+    started = time.perf_counter()
+    graph = ControlFlowGraph(env.get_program(), env.memory)
+    assert time.perf_counter() - started < 0.5
+    assert graph.errors == []
+
+def test_program_is_split_into_blocks() -> None:
+    env, _ = load(GAME)
+    graph = env.get_graph()
+    blocks = [
+        [line.number for line in graph.get_block(leader)]
+        for leader in sorted(graph.leaders)
+    ]
+    assert blocks == [[1], [2, 3, 4], [5], [6], [7, 8], [9, 10, 11],
+        [12, 13, 14]]
+    # A block can be started part way through, e.g. after an unknown jump.
+    block = graph.get_block(address_of_line(env, 3))
+    assert [line.number for line in block] == [3, 4]
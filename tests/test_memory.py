@@ -1,6 +1,8 @@
 # This tests the memory module of the MikeOS Basic Emulator.
 # It checks that the memory module can read and write bytes, words, and strings.
 
+import pytest
+
 from memory import Memory
 
 memory = Memory()
@@ -23,4 +25,127 @@ def test_read_write_string_limit() -> None:
     
 def test_write_string_without_limit() -> None:
     memory.write_string(0x4000, 'test')
-    assert memory.read_string(0x4000) == 'test'
\ No newline at end of file
+    assert memory.read_string(0x4000) == 'test'
+
+def test_view_string_is_not_a_copy() -> None:
+    memory.write_string(0x4000, 'view\0')
+    view = memory.view_string(0x4000)
+    assert bytes(view) == b'view'
+    memory.write_byte(0x4000, ord('V'))
+    assert bytes(view) == b'View'
+
+def test_write_past_end_of_memory_wraps() -> None:
+    memory.write_string(0xFFFE, 'test')
+    memory.write_data(0xFFFF, b'xyz')
+    assert len(memory.data) == 65536
+    assert memory.read_string(0xFFFE, 4) == 'txyz'
+    assert memory.read_data(0x0000, 2) == b'yz'
+
+def test_word_wraps_around() -> None:
+    memory.write_word(0xFFFF, 0xABCD)
+    assert memory.read_byte(0xFFFF) == 0xCD
+    assert memory.read_byte(0x0000) == 0xAB
+    assert memory.read_word(0xFFFF) == 0xABCD
+
+def test_addresses_are_masked() -> None:
+    memory.write_byte(0x14000, 0x55)
+    assert memory.read_byte(0x4000) == 0x55
+    assert memory.read_byte(-0x10000 + 0x4000) == 0x55
+
+def test_block_operations_wrap() -> None:
+    memory.fill_data(0xFFFC, ord('w'), 8)
+    assert memory.read_data(0xFFFC, 8) == b'w' * 8
+    memory.copy_data(0xFFFC, 0x5000, 8)
+    assert memory.read_data(0x5000, 8) == b'w' * 8
+    assert memory.compare_data(0xFFFC, 0x5000, 8) == -1
+
+def test_searches_wrap_around() -> None:
+    searched = Memory()
+    searched.write_data(0xFFFE, b'EN')
+    searched.write_data(0x0000, b'D\nX\n')
+    # Without a limit, the search stops at the end of memory.
+    with pytest.raises(ValueError):
+        searched.find_string('END', 0xFFF0)
+    assert searched.find_string('END', 0xFFF0, 0x0100) == 0xFFFE
+    assert searched.find_string('X', 0x1FFF0, 0x10100) == 0x0002
+    assert searched.find_string('X', 0x0003, 0x0003) == 0x0002
+    assert searched.find_next_line(0xFFF0, 0x0100) == 0x0002
+    searched.write_byte(0xFFFF, ord('\n'))
+    assert searched.find_next_line(0xFFF0) == 0x0000
+    assert searched.find_next_line(0x1FFFF) == 0x0000
+
+def test_word_views_are_masked() -> None:
+    memory.write_word(0xFFFC, 0x1234)
+    assert memory.view_words(0x1FFFC, 1).tolist() == [0x1234]
+    assert memory.view_words(0xFFFE, 1) is not None
+    # A view can't wrap around.
+    assert memory.view_words(0xFFFF, 1) is None
+
+def test_dump_wraps_around(capsys) -> None:
+    memory.write_data(0xFFFF, b'\x12\x34')
+    memory.dump(0x1FFFF, 2)
+    assert capsys.readouterr().out == 'ffff: 12\n0000: 34\n'
+
+def test_file_backed_memory_is_shared(tmp_path) -> None:
+    path = tmp_path / 'memory.bin'
+    mapped = Memory(path)
+    mapped.write_string(0x4100, 'shared\0')
+    mapped.write_word(0x4000, 0x1234)
+    with open(path, 'rb') as file:
+        contents = file.read()
+    assert len(contents) == 65536
+    assert contents[0x4100:0x4107] == b'shared\0'
+    assert contents[0x4000:0x4002] == b'\x34\x12'
+
+    with open(path, 'r+b') as file:
+        file.seek(0x4100)
+        file.write(b'S')
+        file.flush()
+    assert mapped.read_string(0x4100) == 'Shared'
+
+def test_file_backed_memory_lines(tmp_path) -> None:
+    mapped = Memory(tmp_path / 'memory.bin')
+    mapped.write_data(0x8000, b'PRINT "A"\nEND\n')
+    assert mapped.read_line(0x8000) == 'PRINT "A"'
+    assert mapped.find_next_line(0x8000) == 0x800A
+    assert mapped.find_string('END', 0x8000) == 0x800A
+
+def test_watchpoint_traps_writes() -> None:
+    watched = Memory()
+    hits = []
+    watched.watch_handler = lambda watchpoint, address, length, is_write: \
+        hits.append((address, length, is_write))
+    watchpoint = watched.add_watchpoint(0x4100, 0x4180)
+    watched.write_byte(0x40FF, 1)
+    watched.write_byte(0x4180, 1)
+    watched.read_byte(0x4100)
+    assert hits == []
+    watched.write_word(0x40FF, 0x1234)
+    watched.write_string(0x4120, 'clobbered')
+    assert hits == [(0x40FF, 2, True), (0x4120, 9, True)]
+    watched.remove_watchpoint(watchpoint)
+    watched.write_byte(0x4100, 1)
+    assert len(hits) == 2
+    assert watched.watched_pages == 0
+
+def test_watchpoint_traps_reads() -> None:
+    watched = Memory()
+    hits = []
+    watched.watch_handler = lambda watchpoint, address, length, is_write: \
+        hits.append((address, is_write))
+    watched.add_watchpoint(0x8000, 0x8001, on_read=True, on_write=False)
+    watched.write_byte(0x8000, 1)
+    watched.read_word(0x7FFF)
+    watched.read_data(0x7000, 0x2000)
+    assert hits == [(0x7FFF, False), (0x7000, False)]
+
+def test_watchpoint_traps_word_wrapping_around() -> None:
+    watched = Memory()
+    hits = []
+    watched.watch_handler = lambda watchpoint, address, length, is_write: \
+        hits.append((address, length, is_write))
+    watched.add_watchpoint(0x0000, 0x0001, on_read=True, on_write=True)
+    watched.write_word(0xFFFF, 0x1234)
+    assert watched.read_word(0xFFFF) == 0x1234
+    # The high byte of the word at 0xFFFF is at 0x0000.
+    assert hits == [(0x0000, 1, True), (0x0000, 1, False)]
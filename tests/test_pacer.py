@@ -0,0 +1,28 @@
+# Tests for the line pacer of the MikeOS Basic Emulator.
+
+import time
+
+from pacer import LinePacer
+
+def test_pacer_limits_rate() -> None:
+    pacer = LinePacer(2000)
+    start = time.perf_counter()
+    for _ in range(400):
+        pacer.wait()
+    elapsed = time.perf_counter() - start
+    # The first bucket of lines is free, the rest must be paced.
+    assert elapsed >= (400 - pacer.capacity * 2) / 2000
+
+def test_pacer_does_not_sleep_within_burst() -> None:
+    pacer = LinePacer(1000, granularity=0.01)
+    for _ in range(10):
+        pacer.wait()
+    assert pacer.sleeps == 0
+
+def test_pacer_records_jitter() -> None:
+    pacer = LinePacer(1000)
+    for _ in range(50):
+        pacer.wait()
+    mean, rms, worst = pacer.get_jitter()
+    assert pacer.sleeps > 0
+    assert worst >= mean
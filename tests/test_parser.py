@@ -177,4 +177,14 @@ def test_parser_with_string_reference():
         (TokenType.VARIABLE, 'A'),
         (TokenType.SYMBOL, '='),
         (TokenType.STRING_VAR_REF, '&$1')
-    ]
\ No newline at end of file
+    ]
+
+def test_number_out_of_range():
+    parser = CommandParser()
+    assert parser.decode_token('65535') == (TokenType.NUMBER, 65535)
+    with pytest.raises(DecodingError):
+        parser.decode_token('65536')
+
+def test_symbol_at_start_of_word():
+    parser = CommandParser()
+    assert parser.split_line('(A + (1)') == ['(', 'A', '+', '(', '1', ')']
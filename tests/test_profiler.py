@@ -0,0 +1,59 @@
+# This tests the memory profiler of the MikeOS Basic Emulator.
+# It checks accesses are counted and the heatmaps can be saved.
+
+import pygame
+
+from debugger import Debugger
+from profiler import ProfiledMemory
+from variables import VariableManager
+
+def test_counts_reads_and_writes() -> None:
+    memory = ProfiledMemory()
+    memory.write_byte(0x9000, 1)
+    memory.read_word(0x9000)
+    memory.write_data(0xA000, b'DATA')
+    memory.view_data(0xA000, 4)
+    assert memory.writes[0x9000] == 1
+    assert memory.reads[0x9000] == 1
+    assert memory.reads[0x9001] == 1
+    assert list(memory.writes[0xA000:0xA005]) == [1, 1, 1, 1, 0]
+    assert list(memory.reads[0xA000:0xA005]) == [1, 1, 1, 1, 0]
+
+def test_counts_variable_access() -> None:
+    memory = ProfiledMemory()
+    variables = VariableManager(memory, Debugger())
+    variables.set_numeric_variable('A', 1)
+    variables.get_numeric_variable('A')
+    variables.set_string_variable('$1', 'hot')
+    variables.get_string_variable('$1')
+    variables.get_string_variable('$1')
+    a = variables.get_numeric_variable_pointer('A')
+    s = variables.get_string_variable_pointer('$1')
+    assert memory.writes[a] == 1
+    assert memory.reads[a] == 1
+    assert memory.reads[s] == 2
+
+def test_page_counts() -> None:
+    memory = ProfiledMemory()
+    memory.write_data(0x40F0, bytes(0x20))
+    reads, writes = memory.get_page_counts()
+    assert writes[0x40] == 0x10
+    assert writes[0x41] == 0x10
+    assert reads.sum() == 0
+
+def test_save_heatmaps(tmp_path) -> None:
+    memory = ProfiledMemory()
+    memory.write_byte(0x4000, 1)
+    memory.read_byte(0x8000)
+    memory.save_heatmap(tmp_path / 'heatmap.csv')
+    memory.save_heatmap(tmp_path / 'heatmap.png')
+    lines = (tmp_path / 'heatmap.csv').read_text().splitlines()
+    assert lines == [
+        'address,page,reads,writes',
+        f'{0x4000},{0x40},0,1',
+        f'{0x8000},{0x80},1,0',
+    ]
+    image = pygame.image.load(tmp_path / 'heatmap.png')
+    assert image.get_size() == (512, 512)
+    assert image.get_at((0, 0x40 * 2))[:3] == (255, 0, 0)
+    assert image.get_at((0, 0x80 * 2))[:3] == (0, 255, 0)
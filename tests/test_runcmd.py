@@ -1,5 +1,16 @@
+import pytest
+
+from arglist import CommandArgumentList
+from constants import DEFAULT_LOAD_POINT
 from environment import Environment
-from runcmd import CommandRunner
+from expression import ExpressionCompiler
+from runcmd import (
+    CommandQueue,
+    CommandRunner,
+    CommandRunnerThread,
+    InterpreterSyntaxError,
+)
+from tests.helpers import load_thread
 
 env = Environment()
 
@@ -73,4 +84,117 @@ def test_overflow() -> None:
 def test_modulo() -> None:
     runner = CommandRunner(env)
     runner.run_command('A = 5 % 2')
-    assert env.variables.get_numeric_variable('A') == 1
\ No newline at end of file
+    assert env.variables.get_numeric_variable('A') == 1
+
+def test_batch_submission() -> None:
+    thread = CommandRunnerThread(env, CommandQueue())
+    future = thread.submit(['A = 5', 'B = A + 1'])
+    thread.run_from_queue()
+    assert future.done()
+    assert env.variables.get_numeric_variable('B') == 6
+
+def test_batch_runs_conditional_commands_in_order() -> None:
+    thread = CommandRunnerThread(env, CommandQueue())
+    future = thread.submit_script('A = 1\nIF A = 1 THEN B = 7\nC = B')
+    thread.run_from_queue()
+    future.result()
+    assert env.variables.get_numeric_variable('C') == 7
+
+def test_batch_error_is_reported_on_future() -> None:
+    thread = CommandRunnerThread(env, CommandQueue())
+    future = thread.submit(['A = 2', 'NOTACOMMAND', 'A = 3'])
+    thread.run_from_queue()
+    assert isinstance(future.exception(), InterpreterSyntaxError)
+    assert env.variables.get_numeric_variable('A') == 2
+
+def test_batch_exit_is_reported_on_future() -> None:
+    thread = CommandRunnerThread(env, CommandQueue())
+    def cmd_quit(args: CommandArgumentList, env: Environment) -> None:
+        raise SystemExit
+    thread.interpreter.register_command('QUIT', cmd_quit)
+    future = thread.submit(['A = 4', 'QUIT', 'A = 5'])
+    with pytest.raises(SystemExit):
+        thread.run_from_queue()
+    assert isinstance(future.exception(), SystemExit)
+    assert env.variables.get_numeric_variable('A') == 4
+
+def test_memfill_and_memcopy() -> None:
+    runner = CommandRunner(env)
+    runner.run_command('MEMFILL 42 40000 100')
+    runner.run_command('MEMCOPY 40000 41000 100')
+    assert env.memory.read_data(41000, 101) == bytearray([42] * 100 + [0])
+
+def test_memcopy_overlapping() -> None:
+    runner = CommandRunner(env)
+    env.memory.write_data(42000, b'ABCDEF')
+    runner.run_command('MEMCOPY 42000 42002 4')
+    assert env.memory.read_data(42000, 6) == b'ABABCD'
+
+def test_memcompare() -> None:
+    runner = CommandRunner(env)
+    env.memory.write_data(43000, b'SAME')
+    env.memory.write_data(43100, b'SAME')
+    runner.run_command('MEMCOMPARE A 43000 43100 4')
+    assert env.variables.get_numeric_variable('A') == 0
+    runner.run_command('POKE 0 43102')
+    runner.run_command('MEMCOMPARE A 43000 43100 4')
+    assert env.variables.get_numeric_variable('A') == 3
+
+def test_bracketed_assignment(monkeypatch) -> None:
+    monkeypatch.setattr(ExpressionCompiler, 'precedence', True)
+    runner = CommandRunner(env)
+    runner.run_command('A = 3')
+    runner.run_command('B = (A + 1) * (A + 2) - A / 3')
+    assert env.variables.get_numeric_variable('B') == 19
+
+def test_conditional_tail_runs_from_same_line() -> None:
+    runner = CommandRunner(env)
+    env.set_command_runner(runner)
+    runner.run_command('A = 1')
+    runner.run_command('B = 0')
+    line = 'IF A = 1 THEN B = B + 2'
+    for _ in range(2):
+        runner.run_command(line)
+    assert env.variables.get_numeric_variable('B') == 4
+    # The sum after THEN was compiled once, as part of the IF line.
+    assert list(runner.parsed_commands[line].expressions) == [7]
+
+def test_nested_conditional_tails() -> None:
+    runner = CommandRunner(env)
+    env.set_command_runner(runner)
+    runner.run_command('A = 1')
+    runner.run_command('C = 0')
+    runner.run_command('IF A = 1 THEN IF A = 2 THEN C = 5')
+    runner.run_command('ELSE IF A = 1 THEN C = 6')
+    assert env.variables.get_numeric_variable('C') == 6
+
+def test_program_runs_in_blocks() -> None:
+    env, thread = load_thread('''\
+A = 0
+FOR I = 1 TO 10
+A = A + I
+IF A > 20 THEN GOSUB big
+NEXT I
+END
+big:
+B = B + 1
+RETURN
+''')
+    calls = 0
+    while thread.running_from_memory and not env.program_finished:
+        thread.run_from_memory()
+        calls += 1
+    assert env.variables.get_numeric_variable('A') == 55
+    assert env.variables.get_numeric_variable('B') == 5
+    # Around 60 lines were run, but the queue was only checked a few times.
+    assert calls < 10
+
+def test_block_stops_when_program_changes() -> None:
+    # The POKE changes `A = 1` to `B = 1` in the same block.
+    address = DEFAULT_LOAD_POINT + len('POKE 66 00000\nC = 1\n')
+    env, thread = load_thread(f'POKE 66 {address:05}\nC = 1\nA = 1\n')
+    while thread.running_from_memory and not env.program_finished:
+        thread.run_from_memory()
+    assert env.variables.get_numeric_variable('A') == 0
+    assert env.variables.get_numeric_variable('B') == 1
+    assert env.variables.get_numeric_variable('C') == 1
@@ -0,0 +1,41 @@
+# Tests for the shared text buffer used by the out-of-process renderer.
+
+from backend.shared.buffer import SharedTextBuffer, FLAG_CURSOR_VISIBLE
+
+def test_snapshot_after_write() -> None:
+    buffer = SharedTextBuffer(4, 2)
+    buffer.begin_write()
+    buffer.cells[0:2] = b'A\x07'
+    buffer.set_cursor(1, 1)
+    buffer.end_write()
+    generation, cells, col, row, _ = buffer.read_snapshot()
+    assert generation == 2
+    assert cells[0:2] == b'A\x07'
+    assert (col, row) == (1, 1)
+    buffer.close()
+
+def test_snapshot_during_write_is_rejected() -> None:
+    buffer = SharedTextBuffer(4, 2)
+    buffer.begin_write()
+    assert buffer.read_snapshot() is None
+    buffer.end_write()
+    assert buffer.read_snapshot() is not None
+    buffer.close()
+
+def test_nested_writes_keep_generation_odd() -> None:
+    buffer = SharedTextBuffer(4, 2)
+    buffer.begin_write()
+    buffer.begin_write()
+    buffer.end_write()
+    assert buffer.get_generation() % 2 == 1
+    buffer.end_write()
+    assert buffer.get_generation() % 2 == 0
+    buffer.close()
+
+def test_attach_by_name() -> None:
+    owner = SharedTextBuffer(4, 2)
+    other = SharedTextBuffer(4, 2, owner.get_name())
+    owner.set_interpreter_flag(FLAG_CURSOR_VISIBLE, True)
+    assert other.get_interpreter_flag(FLAG_CURSOR_VISIBLE)
+    other.close()
+    owner.close()
@@ -0,0 +1,57 @@
+# This tests the snapshot ring of the MikeOS Basic Emulator's debugger.
+# It checks that stepping back restores memory and interpreter state.
+
+import pytest
+
+from environment import Environment
+from runcmd import CommandRunner, EndOfProgramError
+from snapshots import SnapshotRing
+from tests.helpers import load
+
+PROGRAM = '''\
+A = 0
+FOR I = 1 TO 50
+A = A + I
+$1 = "LOOP"
+POKE I 40000 + I
+NEXT I
+'''
+
+def run_lines(env: Environment, runner: CommandRunner,
+    ring: SnapshotRing, lines: int) -> None:
+
+    for _ in range(lines):
+        ring.on_line(env)
+        runner.step()
+
+def test_step_back_matches_original_run() -> None:
+    env, runner = load(PROGRAM)
+    ring = SnapshotRing(interval=7, budget=1_000_000)
+    env.debugger.snapshots = ring
+    run_lines(env, runner, ring, 60)
+    memory_at_60 = env.memory.get_image()
+    state_at_60 = env.save_state()
+    a_at_60 = env.variables.get_numeric_variable('A')
+    run_lines(env, runner, ring, 40)
+    assert env.variables.get_numeric_variable('A') != a_at_60
+
+    env.debugger.step_back(env, 40)
+    assert ring.lines_run == 60
+    assert env.memory.get_image() == memory_at_60
+    assert env.variables.get_numeric_variable('A') == a_at_60
+    assert env.next_line_address == state_at_60.next_line_address
+    assert env.for_variables['I'].state == state_at_60.for_variables['I'].state
+
+    # Running on from there goes the same way as before.
+    with pytest.raises(EndOfProgramError):
+        run_lines(env, runner, ring, 1000)
+    assert env.variables.get_numeric_variable('A') == sum(range(1, 51))
+
+def test_budget_drops_oldest_snapshots() -> None:
+    env, runner = load(PROGRAM)
+    ring = SnapshotRing(interval=1, budget=8000)
+    run_lines(env, runner, ring, 200)
+    assert ring.size <= 8000
+    assert ring.get_oldest_line() > 0
+    assert ring.rewind(env, 0) == -1
+    assert ring.rewind(env, ring.get_oldest_line()) == ring.get_oldest_line()
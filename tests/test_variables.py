@@ -1,5 +1,7 @@
 # Tests for the variables module
 
+import mmap
+
 import pytest
 
 from variables import VariableManager, InvalidVariableError
@@ -27,4 +29,85 @@ def test_get_string_variable():
 def test_get_invalid_string_variable():
     vars = VariableManager(memory, debugger)
     with pytest.raises(InvalidVariableError):
-        vars.get_string_variable('9')
\ No newline at end of file
+        vars.get_string_variable('9')
+
+def test_numeric_variable_matches_memory():
+    vars = VariableManager(memory, debugger)
+    addr = vars.get_numeric_variable_pointer('Z')
+    vars.set_numeric_variable('Z', 0x1234)
+    assert memory.read_byte(addr) == 0x34
+    assert memory.read_byte(addr + 1) == 0x12
+    memory.write_word(addr, 0xBEEF)
+    assert vars.get_numeric_variable('Z') == 0xBEEF
+
+def test_numeric_variable_wraps():
+    vars = VariableManager(memory, debugger)
+    vars.set_numeric_variable('B', -1)
+    assert vars.get_numeric_variable('B') == 65535
+    vars.set_numeric_variable('B', 65537)
+    assert vars.get_numeric_variable('B') == 1
+
+def test_set_invalid_numeric_variable():
+    vars = VariableManager(memory, debugger)
+    with pytest.raises(InvalidVariableError):
+        vars.set_numeric_variable('AB', 1)
+
+def test_string_variable_sees_memory_writes():
+    vars = VariableManager(memory, debugger)
+    vars.set_string_variable('$2', 'cached')
+    assert vars.get_string_variable('$2') == 'cached'
+    memory.write_byte(vars.get_string_variable_pointer('$2'), ord('C'))
+    assert vars.get_string_variable('$2') == 'Cached'
+    memory.write_data(vars.get_string_variable_pointer('$2') + 1, b'AB\0')
+    assert vars.get_string_variable('$2') == 'CAB'
+
+def test_string_cache_only_cleared_on_overlap():
+    vars = VariableManager(memory, debugger)
+    vars.set_string_variable('$3', 'three')
+    vars.set_string_variable('$4', 'four')
+    vars.get_string_variable('$3')
+    vars.get_string_variable('$4')
+    vars.set_string_variable('$4', 'FOUR')
+    assert vars.string_cache[2] == 'three'
+    assert vars.string_cache[3] is None
+
+def test_close_removes_write_listener():
+    shared = Memory()
+    managers = [VariableManager(shared, debugger) for _ in range(100)]
+    assert len(shared.write_listeners) == 100
+    for vars in managers:
+        vars.close()
+    assert shared.write_listeners == []
+    # A closed manager reads strings from memory rather than a stale cache.
+    vars = managers[0]
+    vars.set_string_variable('$1', 'before')
+    shared.write_string(vars.get_string_variable_pointer('$1'), 'after\0')
+    assert vars.get_string_variable('$1') == 'after'
+
+def test_shared_memory_strings_are_not_cached(tmp_path):
+    path = tmp_path / 'memory.bin'
+    vars = VariableManager(Memory(path), debugger)
+    vars.set_string_variable('$1', 'hello')
+    assert vars.get_string_variable('$1') == 'hello'
+    # Another process pokes the string through its own mapping.
+    with open(path, 'r+b') as file:
+        other = mmap.mmap(file.fileno(), 0)
+        address = vars.get_string_variable_pointer('$1')
+        other[address:address + 6] = b'WORLD\0'
+        other.flush()
+        other.close()
+    assert vars.get_string_variable('$1') == 'WORLD'
+
+def test_watched_variables_trap():
+    watched = Memory()
+    vars = VariableManager(watched, debugger)
+    hits = []
+    watched.watch_handler = lambda watchpoint, address, length, is_write: \
+        hits.append((address, is_write))
+    watched.add_watchpoint(vars.get_numeric_variable_pointer('C'),
+        vars.get_numeric_variable_pointer('D'), on_read=True)
+    vars.set_numeric_variable('B', 1)
+    vars.set_numeric_variable('C', 2)
+    assert vars.get_numeric_variable('C') == 2
+    addr = vars.get_numeric_variable_pointer('C')
+    assert hits == [(addr, True), (addr, False)]